@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import plot_battle_time
+
+# =========================================================
+# 全攻撃国のアクティビティキューブ (国 × 現実日付 × 時刻)
+# =========================================================
+# plot_battle_time.py は1つの攻撃国について毎回ファイルを解析し直すが、
+# ここでは1回の解析で全攻撃国ぶんの撃破数を NumPy 配列にまとめて .npz に保存する。
+# どの国の時間帯ヒストグラムやタイムラインも、配列のスライスだけで求められる。
+#
+#   counts[国, 日付, 時]          (with_victim=False)
+#   counts[国, 被害国, 日付, 時]  (with_victim=True)
+
+DEFAULT_CUBE_FILE = "activity_cube.npz"
+
+
+class ActivityCube:
+    def __init__(self, counts, attackers, dates, victims=None, meta=None):
+        self.counts = counts
+        self.attackers = list(attackers)
+        self.dates = list(dates)  # 'YYYY-MM-DD'
+        self.victims = list(victims) if victims is not None else None
+        self.meta = meta or {}
+        self._attacker_index = {c: i for i, c in enumerate(self.attackers)}
+
+    # -----------------------------------
+    # 作成・保存
+    # -----------------------------------
+    @classmethod
+    def build(cls, combat_events, with_victim=False, game_speed=plot_battle_time.GAME_SPEED,
+              ref_real_time_str=plot_battle_time.REFERENCE_REAL_TIME_STR,
+              ref_game_day=plot_battle_time.REFERENCE_GAME_DAY,
+              ref_game_time_str=plot_battle_time.REFERENCE_GAME_TIME_STR):
+        """ extract_combat_events の結果から1回でキューブを作る """
+        ref_real_dt = datetime.strptime(ref_real_time_str, "%Y-%m-%d %H:%M:%S")
+        ref_game_total_sec = plot_battle_time.parse_game_total_seconds(str(ref_game_day), ref_game_time_str)
+
+        rows = []
+        for ev in combat_events:
+            real_dt = plot_battle_time.get_real_time_from_game_time(
+                ev['game_day'], ev['game_time'], ref_real_dt, ref_game_total_sec, game_speed)
+            if real_dt:
+                rows.append((ev['attacker'], ev['victim'], real_dt))
+
+        attackers = sorted({r[0] for r in rows})
+        victims = sorted({r[1] for r in rows}) if with_victim else None
+        if rows:
+            first = min(r[2] for r in rows).date()
+            last = max(r[2] for r in rows).date()
+            dates = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+        else:
+            first, dates = None, []
+
+        a_index = {c: i for i, c in enumerate(attackers)}
+        a_idx = np.array([a_index[r[0]] for r in rows], dtype=np.int32)
+        d_idx = np.array([(r[2].date() - first).days for r in rows], dtype=np.int32)
+        h_idx = np.array([r[2].hour for r in rows], dtype=np.int32)
+
+        if with_victim:
+            v_index = {c: i for i, c in enumerate(victims)}
+            v_idx = np.array([v_index[r[1]] for r in rows], dtype=np.int32)
+            counts = np.zeros((len(attackers), len(victims), len(dates), 24), dtype=np.int32)
+            np.add.at(counts, (a_idx, v_idx, d_idx, h_idx), 1)
+        else:
+            counts = np.zeros((len(attackers), len(dates), 24), dtype=np.int32)
+            np.add.at(counts, (a_idx, d_idx, h_idx), 1)
+
+        meta = {'game_speed': game_speed, 'ref_real_time': ref_real_time_str,
+                'ref_game_day': ref_game_day, 'ref_game_time': ref_game_time_str}
+        return cls(counts, attackers, dates, victims, meta)
+
+    def save(self, path=DEFAULT_CUBE_FILE):
+        arrays = {
+            'counts': self.counts,
+            'attackers': np.array(self.attackers, dtype=str),
+            'dates': np.array(self.dates, dtype=str),
+            'meta_keys': np.array(list(self.meta.keys()), dtype=str),
+            'meta_values': np.array([str(v) for v in self.meta.values()], dtype=str),
+        }
+        if self.victims is not None:
+            arrays['victims'] = np.array(self.victims, dtype=str)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CUBE_FILE):
+        with np.load(path) as data:
+            victims = data['victims'].tolist() if 'victims' in data.files else None
+            meta = dict(zip(data['meta_keys'].tolist(), data['meta_values'].tolist()))
+            return cls(data['counts'], data['attackers'].tolist(), data['dates'].tolist(), victims, meta)
+
+    # -----------------------------------
+    # 参照 (配列のスライスのみ)
+    # -----------------------------------
+    def country_slice(self, country, victim=None):
+        """ 指定国の (日付 × 時) 配列を返す。被害国の軸があれば victim で絞り込める """
+        i = self._attacker_index.get(country)
+        if i is None:
+            return np.zeros((len(self.dates), 24), dtype=np.int32)
+        block = self.counts[i]
+        if self.victims is not None:
+            if victim is None:
+                return block.sum(axis=0)
+            if victim not in self.victims:
+                return np.zeros((len(self.dates), 24), dtype=np.int32)
+            return block[self.victims.index(victim)]
+        return block
+
+    def hour_histogram(self, country, victim=None):
+        """ 時刻 (0-23時) ごとの撃破数 """
+        return self.country_slice(country, victim).sum(axis=0)
+
+    def timeline(self, country, victim=None):
+        """ 日付ごとの撃破数 (dates と同じ順) """
+        return self.country_slice(country, victim).sum(axis=1)
+
+    def totals(self):
+        """ 攻撃国ごとの総撃破数 """
+        axes = tuple(range(1, self.counts.ndim))
+        return dict(zip(self.attackers, self.counts.sum(axis=axes).tolist()))
+
+
+def print_country(cube, country, victim=None):
+    hist = cube.hour_histogram(country, victim)
+    timeline = cube.timeline(country, victim)
+    print(f"\n■ {country}" + (f" → {victim}" if victim else "") + f" (合計: {int(hist.sum())})")
+    print("【時刻別 (現実時間)】")
+    peak = max(int(hist.max()), 1)
+    for h, n in enumerate(hist.tolist()):
+        print(f"{h:02}時 | {'#' * round(n * 30 / peak):<30} {n}")
+    print("【日付別】")
+    for date, n in zip(cube.dates, timeline.tolist()):
+        if n:
+            print(f"{date} : {n}")
@@ -1,13 +1,13 @@
 import bs4
-from bs4 import BeautifulSoup
 import re
-import pandas as pd
-import folium
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
 import os
 import glob
 import unicodedata
+from event_dedup import EventDeduplicator
+from newspaper_stream import iter_articles
+from event_filter import EventFilter
+import locale_patterns
+# folium / geopy は重いので、使う関数の中でだけ import する
 
 # -----------------------------------
 # 設定
@@ -16,8 +16,6 @@ import unicodedata
 # (同じ階層にある場合は '.' 、別のフォルダなら 'data/files' などを指定)
 TARGET_DIR = "data_zombi" 
 FILE_PATTERN = "*.html"
-files_path = os.path.join(TARGET_DIR, FILE_PATTERN)
-INPUT_FILES = glob.glob(files_path)
 
 OUTPUT_MAP = 'war_map_con_wiki.html'
 
@@ -144,289 +142,385 @@ def get_display_width(text):
             width += 1
     return width
 
-def print_aligned_table(df, cols):
-    """
-    LINEなどのチャットアプリ用に、表形式ではなくリスト形式で出力する。
-    スマホのプロポーショナルフォントでも崩れず見やすくなります。
-    """
-    if df.empty:
-        return
-
-    # 国名でグルーピングして出力する
-    # dfは呼び出し元ですでにソートされている前提 (Country, Count順)
-    current_country = None
-    
-    for _, row in df.iterrows():
-        country = str(row[cols[0]]) # Country
-        unit = str(row[cols[1]])    # Unit
-        count = str(row[cols[2]])   # Count
-        
-        # 国名が変わったら見出しを表示
-        if country != current_country:
-            # 視認性を高めるため、2カ国目以降は上に空行を入れる
-            prefix = "\n" if current_country is not None else ""
-            print(f"{prefix}■ {country}")
-            current_country = country
-        
-        # ユニットと数を表示
-        # インデントに全角スペースを使うと、日本語環境では比較的揃って見えやすい
-        print(f"　{unit}: {count}")
-
 # ---------------------------------------------------------
 # 1. 解析とデータ抽出
 # ---------------------------------------------------------
-all_casualties = [] 
-all_map_events = [] 
-
-print(f"対象ファイル: {INPUT_FILES}")
-
-for file_path in INPUT_FILES:
-    if not os.path.exists(file_path):
-        print(f"警告: ファイルが見つかりません -> {file_path}")
-        continue
+def get_files(target_dir=TARGET_DIR):
+    return glob.glob(os.path.join(target_dir, FILE_PATTERN))
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-
-    soup = BeautifulSoup(html_content, 'html.parser')
-    articles = soup.find_all('div', class_='newspaper_article')
-    
-    print(f"[{file_path}] {len(articles)} 件の記事を解析中...")
+def make_filter(countries=None, event_types=None, day_range=None):
+    """ 除外リストと翻訳辞書を組み込んだ EventFilter を作る """
+    return EventFilter(countries, EXCLUDED_COUNTRIES, event_types, day_range, aliases=TRANSLATION_DICT)
 
-    for article in articles:
-        body = article.find('div', class_='newspaper_body')
-        if not body: continue
-        
-        paragraphs = body.find_all('p')
-        for p in paragraphs:
-            text = p.get_text().strip()
-            
-            # --- 日時取得 ---
-            date_span = p.find('span', class_='event_time')
-            date_str = date_span.get_text().strip() if date_span else "Unknown"
-            day_label = "Unknown Day"
-            if len(date_str.split()) >= 2:
-                day_label = f"{date_str.split()[0]} {date_str.split()[1]}"
-
-            sort_key = 0
-            time_match = re.search(r'(\d+)\s+(\d{2}):(\d{2}):(\d{2})', date_str)
-            if time_match:
-                d, h, m, s = map(int, time_match.groups())
-                sort_key = d * 86400 + h * 3600 + m * 60 + s
+def extract_events(input_files, dedup=None, event_filter=None, sampler=None):
+    """
+    HTMLを解析し、(損失データのリスト, 地図イベントのリスト) を返す。
+    複数のファイルに入っている同じイベントは1回だけ数える (event_dedup.py)。
+    event_filter (event_filter.EventFilter) で国・種別・日数を絞ると、対象外は翻訳などの前に捨てる。
+    国の条件は、損失なら被害国、地図イベントなら攻撃国に対して判定する。
+    sampler (event_sampler.PreviewSampler) を渡すと一部の記事だけを解析する (概算のプレビュー用)。
+    """
+    all_casualties = [] 
+    all_map_events = [] 
+    if dedup is None:
+        dedup = EventDeduplicator.for_files(input_files)
+    if event_filter is None:
+        event_filter = make_filter()
+
+    print(f"対象ファイル: {input_files}")
+
+    for file_path in dedup.order_files(input_files):
+        if not os.path.exists(file_path):
+            print(f"警告: ファイルが見つかりません -> {file_path}")
+            continue
+        if dedup.should_skip_file(file_path):
+            print(f"[{file_path}] 全て解析済みのイベントのためスキップ")
+            continue
+        if not event_filter.file_may_match(file_path, dedup):
+            print(f"[{file_path}] 指定した日数の範囲外のためスキップ")
+            continue
+
+        # ファイル全体を読み込まず、記事を1件ずつ取り出して解析する
+        print(f"[{file_path}] 記事を解析中...")
+        dedup.begin_file(file_path)
+
+        # クライアントの言語を最初の数件の記事から判定し、その言語のパターンだけを使う
+        pack = locale_patterns.pack_for_file(file_path)
+        event_filter.use_locale(pack)
+        keep = sampler.keep_article if sampler else None
+        for article in iter_articles(file_path, raw_filter=event_filter.article_may_match, keep=keep):
+            body = article.find('div', class_='newspaper_body')
+            if not body: continue
             
-            # --- A. 損失データ ---
-            if "lost" in text or "を失いました" in text:
-                country_links = p.find_all(class_='func_country_link')
-                raw_victim = country_links[0].get_text().strip() if country_links else "Unknown"
-                victim_translated = translate(raw_victim)
-
-                if raw_victim in EXCLUDED_COUNTRIES or victim_translated in EXCLUDED_COUNTRIES:
+            paragraphs = body.find_all('p')
+            for p in paragraphs:
+                # --- 日時取得 ---
+                date_span = p.find('span', class_='event_time')
+                date_str = date_span.get_text().strip() if date_span else "Unknown"
+                # 安い判定 (日数・国リンク) で対象外の段落は本文を取り出す前に捨てる
+                if not event_filter.date_ok(date_str) or not event_filter.links_may_match(p):
                     continue
 
-                match = re.search(r'(?:lost:?|を失いました)\s*(\d+)\s*(.+)', text)
-                if match:
-                    raw_unit = match.group(2).strip()
-                    if raw_unit.endswith('.'): raw_unit = raw_unit[:-1]
-                    if " over " in raw_unit:
-                        raw_unit = raw_unit.split(" over ")[0]
-
-                    unit_translated = translate(raw_unit)
-                    all_casualties.append({
-                        'Day': day_label, 'Country': victim_translated,
-                        'Unit': unit_translated, 'Count': int(match.group(1))
-                    })
-
-            # --- B. 地図データ ---
-            prov_link = p.find('span', attrs={'data-prov-name': True})
-            if prov_link:
-                location_name = prov_link['data-prov-name']
-                attacker_country = "Unknown"
-                attacker_unit = "Unknown Unit"
-                event_type = None
-                popup_desc = text
-
-                key_destroyed = ["destroyed by", "により撃破されました", "壊滅しました"]
-                key_occupied = ["occupied", "を占領しました"]
-
-                if any(k in text for k in key_destroyed):
-                    event_type = 'combat'
-                    clean_text = text
-                    for k in key_destroyed:
-                        if k in text:
-                            parts = text.split(k)
-                            if len(parts) > 1:
-                                remainder = parts[1].strip()
-                                if remainder.lower().startswith("the "): remainder = remainder[4:]
-                                clean_text = remainder
-                            break
-                    clean_text = translate(clean_text)
-                    popup_desc = f"<b>{location_name}</b>: {clean_text}"
-
-                    regex_combat = r'(?:destroyed by|により撃破されました) (?:the )?(.+?) \(([^)]+)\)'
-                    match = re.search(regex_combat, text)
+                text = p.get_text().strip()
+                if dedup.is_duplicate(date_str, text):
+                    continue
+                if not event_filter.text_may_match(text):
+                    continue
+                day_label = "Unknown Day"
+                if len(date_str.split()) >= 2:
+                    day_label = f"{date_str.split()[0]} {date_str.split()[1]}"
+
+                sort_key = 0
+                time_match = re.search(r'(\d+)\s+(\d{2}):(\d{2}):(\d{2})', date_str)
+                if time_match:
+                    d, h, m, s = map(int, time_match.groups())
+                    sort_key = d * 86400 + h * 3600 + m * 60 + s
+                
+                # --- A. 損失データ ---
+                if event_filter.wants('loss') and pack.has('loss', text):
+                    country_links = p.find_all(class_='func_country_link')
+                    raw_victim = country_links[0].get_text().strip() if country_links else "Unknown"
+                    if event_filter.is_excluded(raw_victim):
+                        continue
+                    victim_translated = translate(raw_victim)
+
+                    if not event_filter.country_ok(raw_victim, victim_translated):
+                        continue
+
+                    match = pack.regex['loss'].search(text)
                     if match:
-                        attacker_unit = match.group(1).strip()
-                        attacker_country = match.group(2).strip()
-                    else:
-                        c_links = p.find_all(class_='func_country_link')
-                        if len(c_links) >= 2:
-                            attacker_country = c_links[-1].get_text().strip()
-                            attacker_unit = "Enemy Forces"
-                        elif len(c_links) == 1:
-                             if text.find(c_links[0].get_text().strip()) > 10:
-                                attacker_country = c_links[0].get_text().strip()
+                        raw_unit = match.group(2).strip()
+                        if raw_unit.endswith('.'): raw_unit = raw_unit[:-1]
+                        if " over " in raw_unit:
+                            raw_unit = raw_unit.split(" over ")[0]
+
+                        unit_translated = translate(raw_unit)
+                        rec = {
+                            'Day': day_label, 'Country': victim_translated,
+                            'Unit': unit_translated, 'Count': int(match.group(1))
+                        }
+                        if sampler:
+                            rec['Sample'] = sampler.current  # 誤差の推定に使う記事の番号
+                        all_casualties.append(rec)
+
+                # --- B. 地図データ ---
+                prov_link = p.find('span', attrs={'data-prov-name': True})
+                if prov_link:
+                    location_name = prov_link['data-prov-name']
+                    attacker_country = "Unknown"
+                    attacker_unit = "Unknown Unit"
+                    event_type = None
+                    popup_desc = text
+
+                    if event_filter.wants('combat') and pack.has('combat', text):
+                        event_type = 'combat'
+                        clean_text = text
+                        for k in pack.keywords['combat']:
+                            if k in text:
+                                parts = text.split(k)
+                                if len(parts) > 1:
+                                    remainder = parts[1].strip()
+                                    if remainder.lower().startswith("the "): remainder = remainder[4:]
+                                    clean_text = remainder
+                                break
+
+                        match = pack.regex['attacker'].search(text)
+                        if match:
+                            attacker_unit = match.group(1).strip()
+                            attacker_country = match.group(2).strip()
+                        else:
+                            c_links = p.find_all(class_='func_country_link')
+                            if len(c_links) >= 2:
+                                attacker_country = c_links[-1].get_text().strip()
                                 attacker_unit = "Enemy Forces"
+                            elif len(c_links) == 1:
+                                 if text.find(c_links[0].get_text().strip()) > 10:
+                                    attacker_country = c_links[0].get_text().strip()
+                                    attacker_unit = "Enemy Forces"
+
+                    elif event_filter.wants('occupy') and pack.has('occupy', text):
+                        event_type = 'occupy'
+                        popup_desc = f"<b>{location_name}</b>: 占領 (Occupied)"
+                        # 先頭の日時が部隊名に入らないように外してから照合する
+                        match = pack.regex['occupy'].search(text.replace(date_str, '', 1))
+                        if match:
+                            attacker_unit = match.group(1).strip()
+                            if attacker_unit.lower().startswith("the "): attacker_unit = attacker_unit[4:]
+                            attacker_country = match.group(2).strip()
+                        else:
+                            c_links = p.find_all(class_='func_country_link')
+                            if c_links:
+                                attacker_country = c_links[0].get_text().strip()
+                                attacker_unit = "Occupying Force"
+
+                    if not event_type or event_filter.is_excluded(attacker_country):
+                        continue
+                    attacker_country_jp = translate(attacker_country)
+                    
+                    if not event_filter.country_ok(attacker_country, attacker_country_jp):
+                        continue
+
+                    # 本文の翻訳は重いので、絞り込みを通ったイベントだけ行う
+                    if event_type == 'combat':
+                        popup_desc = f"<b>{location_name}</b>: {translate(clean_text)}"
+
+                    if event_type:
+                        all_map_events.append({
+                            'sort_key': sort_key,
+                            'date_display': date_str,
+                            'location': location_name,
+                            'popup_text': popup_desc,
+                            'country': attacker_country_jp, 
+                            'unit_name': translate(attacker_unit),
+                            'type': event_type
+                        })
+        if event_filter.prunes or sampler:
+            dedup.discard_file(cover=not sampler)
+        else:
+            dedup.end_file()
 
-                elif any(k in text for k in key_occupied):
-                    event_type = 'occupy'
-                    popup_desc = f"<b>{location_name}</b>: 占領 (Occupied)"
-                    regex_occupy = r'(?:^|\s)(.+?) \(([^)]+)\) (?:has occupied|を占領しました)'
-                    match = re.search(regex_occupy, text)
-                    if match:
-                        attacker_unit = match.group(1).strip()
-                        attacker_country = match.group(2).strip()
-                    else:
-                        c_links = p.find_all(class_='func_country_link')
-                        if c_links:
-                            attacker_country = c_links[0].get_text().strip()
-                            attacker_unit = "Occupying Force"
-
-                attacker_country_jp = translate(attacker_country)
-                
-                if attacker_country in EXCLUDED_COUNTRIES or attacker_country_jp in EXCLUDED_COUNTRIES:
-                    continue
-
-                if event_type:
-                    all_map_events.append({
-                        'sort_key': sort_key,
-                        'date_display': date_str,
-                        'location': location_name,
-                        'popup_text': popup_desc,
-                        'country': attacker_country_jp, 
-                        'unit_name': translate(attacker_unit),
-                        'type': event_type
-                    })
-
-all_map_events.sort(key=lambda x: x['sort_key'])
+    if dedup.autosave:
+        dedup.save()
+    all_map_events.sort(key=lambda x: x['sort_key'])
+    return all_casualties, all_map_events
 
 # ---------------------------------------------------------
 # 2. 集計レポート
 # ---------------------------------------------------------
-print("\n" + "="*30)
-print("【死亡数集計レポート】")
-print("="*30)
-
-if all_casualties:
-    df_cas = pd.DataFrame(all_casualties)
-    unique_days = sorted(df_cas['Day'].unique())
-    for day in unique_days:
-        print(f"\n>>> 日付: {day}")
-        df_day = df_cas[df_cas['Day'] == day]
-        summary_day = df_day.groupby(['Country', 'Unit'])['Count'].sum().reset_index()
-        summary_day = summary_day.sort_values(by=['Country', 'Count'], ascending=[True, False])
-        print_aligned_table(summary_day, ['Country', 'Unit', 'Count'])
-
-    print("\n" + "-"*30)
-    print("【総合計】")
-    grand_summary = df_cas.groupby(['Country', 'Unit'])['Count'].sum().reset_index()
-    grand_summary = grand_summary.sort_values(by=['Country', 'Count'], ascending=[True, False])
-    print_aligned_table(grand_summary, ['Country', 'Unit', 'Count'])
-else:
-    print("損失データなし")
+def summarize_casualties(all_casualties):
+    """
+    pandas を使わずに損失を集計する。
+    戻り値: {日付ラベル: [(国, 兵種, 数), ...], None: 総合計}  (国名順・数の多い順)
+    """
+    per_day = {}
+    for rec in all_casualties:
+        for key in (rec['Day'], None):
+            bucket = per_day.setdefault(key, {})
+            unit_key = (rec['Country'], rec['Unit'])
+            bucket[unit_key] = bucket.get(unit_key, 0) + rec['Count']
+
+    summary = {}
+    for key, bucket in per_day.items():
+        rows = [(c, u, n) for (c, u), n in bucket.items()]
+        rows.sort(key=lambda r: (r[0], -r[2]))
+        summary[key] = rows
+    return summary
+
+def print_report(all_casualties, formats=None, out_dir='reports'):
+    """ 損失を1回だけ集計し、チャット用テキストを表示する。formats を指定するとファイルにも書き出す """
+    import report_writer
+
+    summary = summarize_casualties(all_casualties)
+    report_writer.print_chat(casualty_summary=summary)
+    if formats:
+        for path in report_writer.write_reports(formats, out_dir, casualty_summary=summary, basename='casualties'):
+            print(f"保存しました: {path}")
 
 # ---------------------------------------------------------
 # 3. 地図生成
 # ---------------------------------------------------------
-print("\n" + "="*60)
-print("【地図生成】")
-print(f"イベント数: {len(all_map_events)}")
-print("座標取得中...")
-
-geolocator = Nominatim(user_agent="war_map_interactive_v2")
-geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.1)
 location_cache = {}
+_geocode = None
+_geo_cache = None
+_resolver = None
+
+def _local_geo():
+    """ 保存済みの座標キャッシュと、地名辞書のあいまい検索 (province_resolver.py) を準備する """
+    global _geo_cache, _resolver
+    if _geo_cache is None:
+        from province_resolver import GeocodeCache, build_resolver
+        _geo_cache = GeocodeCache()
+        _resolver = build_resolver(_geo_cache)
+    return _geo_cache, _resolver
 
 def get_lat_lon(loc_name):
+    global _geocode
     if loc_name in location_cache: return location_cache[loc_name]
+    cache, resolver = _local_geo()
+    entry = cache.get(loc_name)
+    if entry and entry['coords']:
+        location_cache[loc_name] = tuple(entry['coords'])
+        return location_cache[loc_name]
+
+    # ネットワークに問い合わせる前に、地名辞書から似た名前を探す
+    match = resolver.resolve(loc_name)
+    if match:
+        name, coords, score = match
+        if score >= 1:
+            cache.put(loc_name, coords, 'gazetteer', name, score)
+        # あいまい一致は確定させず (キャッシュに保存せず)、次回も地名辞書から解決し直す
+        location_cache[loc_name] = coords
+        print(f"OK (辞書: {name} {score:.2f}): {loc_name}")
+        return coords
+    if entry:
+        # 前回ネットワークでも見つからなかった名前は問い合わせない
+        location_cache[loc_name] = None
+        return None
+
+    if _geocode is None:
+        from geopy.geocoders import Nominatim
+        from geopy.extra.rate_limiter import RateLimiter
+        geolocator = Nominatim(user_agent="war_map_interactive_v2")
+        _geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.1)
     try:
-        loc = geocode(loc_name)
+        loc = _geocode(loc_name)
         if loc:
-            location_cache[loc_name] = (loc.latitude, loc.longitude)
+            coords = (loc.latitude, loc.longitude)
+            location_cache[loc_name] = coords
+            cache.put(loc_name, coords, 'network')
+            resolver.add(loc_name, coords)  # 以降の似た名前はローカルで解決できる
             print(f"OK: {loc_name}")
-            return (loc.latitude, loc.longitude)
+            return coords
         else:
+            cache.put(loc_name, None, 'network')
             print(f"NG: {loc_name}")
             return None
     except:
         return None
 
-unique_locations = set(e['location'] for e in all_map_events)
-for loc in unique_locations:
-    get_lat_lon(loc)
-
-m = folium.Map(location=[35.0, 20.0], zoom_start=3)
-country_layers = {} 
-unit_paths = {}
-
-for event in all_map_events:
-    coords = get_lat_lon(event['location'])
-    if not coords: continue
-    
-    country_name = event['country']
-    current_color = get_dynamic_color(country_name)
-
-    if country_name not in country_layers:
-        fg = folium.FeatureGroup(name=country_name)
-        country_layers[country_name] = fg
-        fg.add_to(m)
-    
-    unit_id = f"{event['unit_name']} ({country_name})"
-    if unit_id not in unit_paths:
-        unit_paths[unit_id] = {'coords': [], 'color': current_color, 'country': country_name}
-    unit_paths[unit_id]['coords'].append(coords)
-    
-    if event['type'] == 'combat':
-        popup_content = f"""
-        <div style="width:250px; font-family:sans-serif;">
-            <strong style="color:gray; font-size:0.9em;">{event['date_display']}</strong><br>
-            <div style="margin-top:5px;">{event['popup_text']}</div>
-        </div>
-        """
-        folium.Marker(
-            location=coords,
-            popup=folium.Popup(popup_content, max_width=300),
-            tooltip=f"{country_name}",
-            icon=folium.Icon(color=current_color, icon='crosshairs', prefix='fa')
-        ).add_to(country_layers[country_name])
-
-for unit_id, data in unit_paths.items():
-    points = data['coords']
-    c_name = data['country']
-    if len(points) > 1 and c_name in country_layers:
-        folium.PolyLine(
-            locations=points,
-            color=data['color'],
-            weight=3,
-            opacity=0.7,
-            tooltip=unit_id
-        ).add_to(country_layers[c_name])
-        folium.CircleMarker(points[0], radius=3, color=data['color'], fill=True).add_to(country_layers[c_name])
-        folium.CircleMarker(points[-1], radius=3, color=data['color'], fill=True).add_to(country_layers[c_name])
-
-folium.LayerControl().add_to(m)
-
-legend_html = '''
-     <div style="position: fixed; 
-     bottom: 30px; left: 30px; width: 160px; height: auto; 
-     border:2px solid grey; z-index:9999; font-size:14px;
-     background-color:rgba(255,255,255,0.9); padding: 10px; border-radius: 5px;">
-     <b>Active Countries</b><br>
-'''
-for country, color in sorted(country_color_map.items()):
-    legend_html += f'<i class="fa fa-circle" style="color:{color}"></i> {country}<br>'
-legend_html += '</div>'
-m.get_root().html.add_child(folium.Element(legend_html))
-
-m.save(OUTPUT_MAP)
-print(f"\n完了: {OUTPUT_MAP}")
-print("ブラウザで地図を開き、右上のアイコンから表示したい国を選択してください。")
\ No newline at end of file
+def build_map(all_map_events, output_map=OUTPUT_MAP, note=None):
+    """ note を指定すると、地図の上部に表示する (概算のプレビューであることを示すため) """
+    import folium
+    from combat_density import add_density_layers
+
+    print("\n" + "="*60)
+    print("【地図生成】")
+    print(f"イベント数: {len(all_map_events)}")
+    print("座標取得中...")
+
+    unique_locations = set(e['location'] for e in all_map_events)
+    for loc in unique_locations:
+        get_lat_lon(loc)
+    _local_geo()[0].save()
+
+    m = folium.Map(location=[35.0, 20.0], zoom_start=3)
+    country_layers = {} 
+    marker_layers = {}  # 国ごとの戦闘マーカー (ズームアウト時は密度レイヤーに切り替えるので経路とは分ける)
+    unit_paths = {}
+    located_combats = []  # 密度レイヤー用 (coords, event)
+
+    for event in all_map_events:
+        coords = get_lat_lon(event['location'])
+        if not coords: continue
+        
+        country_name = event['country']
+        current_color = get_dynamic_color(country_name)
+
+        if country_name not in country_layers:
+            fg = folium.FeatureGroup(name=country_name)
+            country_layers[country_name] = fg
+            fg.add_to(m)
+            marker_layers[country_name] = folium.FeatureGroup(name=f"{country_name} (戦闘)", control=False)
+            marker_layers[country_name].add_to(m)
+        
+        unit_id = f"{event['unit_name']} ({country_name})"
+        if unit_id not in unit_paths:
+            unit_paths[unit_id] = {'coords': [], 'color': current_color, 'country': country_name}
+        unit_paths[unit_id]['coords'].append(coords)
+        
+        if event['type'] == 'combat':
+            located_combats.append((coords, event))
+            popup_content = f"""
+            <div style="width:250px; font-family:sans-serif;">
+                <strong style="color:gray; font-size:0.9em;">{event['date_display']}</strong><br>
+                <div style="margin-top:5px;">{event['popup_text']}</div>
+            </div>
+            """
+            folium.Marker(
+                location=coords,
+                popup=folium.Popup(popup_content, max_width=300),
+                tooltip=f"{country_name}",
+                icon=folium.Icon(color=current_color, icon='crosshairs', prefix='fa')
+            ).add_to(marker_layers[country_name])
+
+    for unit_id, data in unit_paths.items():
+        points = data['coords']
+        c_name = data['country']
+        if len(points) > 1 and c_name in country_layers:
+            folium.PolyLine(
+                locations=points,
+                color=data['color'],
+                weight=3,
+                opacity=0.7,
+                tooltip=unit_id
+            ).add_to(country_layers[c_name])
+            folium.CircleMarker(points[0], radius=3, color=data['color'], fill=True).add_to(country_layers[c_name])
+            folium.CircleMarker(points[-1], radius=3, color=data['color'], fill=True).add_to(country_layers[c_name])
+
+    # ズームアウト時は戦闘マーカーの代わりにヘックス集計の密度レイヤーを表示する (部隊の経路は常に表示)
+    add_density_layers(m, located_combats, {c: (country_layers[c], marker_layers[c]) for c in country_layers})
+
+    folium.LayerControl().add_to(m)
+
+    legend_html = '''
+         <div style="position: fixed; 
+         bottom: 30px; left: 30px; width: 160px; height: auto; 
+         border:2px solid grey; z-index:9999; font-size:14px;
+         background-color:rgba(255,255,255,0.9); padding: 10px; border-radius: 5px;">
+         <b>Active Countries</b><br>
+    '''
+    for country, color in sorted(country_color_map.items()):
+        legend_html += f'<i class="fa fa-circle" style="color:{color}"></i> {country}<br>'
+    legend_html += '</div>'
+    m.get_root().html.add_child(folium.Element(legend_html))
+
+    if note:
+        m.get_root().html.add_child(folium.Element(f'''
+         <div style="position: fixed; top: 10px; left: 50%; transform: translateX(-50%); z-index:9999;
+         background-color:rgba(255,240,200,0.95); border:2px solid #d9822b; padding: 6px 12px;
+         border-radius: 5px; font-size:14px; font-weight:bold; color:#a0522d;">{note}</div>
+        '''))
+
+    m.save(output_map)
+    print(f"\n完了: {output_map}")
+    print("ブラウザで地図を開き、右上のアイコンから表示したい国を選択してください。")
+
+def main(target_dir=TARGET_DIR, output_map=OUTPUT_MAP, make_report=True, make_map=True):
+    all_casualties, all_map_events = extract_events(get_files(target_dir))
+    if make_report:
+        print_report(all_casualties)
+    if make_map:
+        build_map(all_map_events, output_map)
+
+if __name__ == "__main__":
+    main()
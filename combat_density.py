@@ -0,0 +1,236 @@
+import math
+from collections import defaultdict
+
+import folium
+from branca.colormap import linear
+from branca.element import MacroElement
+from jinja2 import Template
+
+# =========================================================
+# 戦闘密度レイヤー (ズームアウト時用のヘックスグリッド集計)
+# =========================================================
+# 広域表示では大量の crosshairs マーカーが重なって見えない上に描画も重いので、
+# 戦闘イベントを事前にヘックスグリッドへ集計し、ズームレベルに応じて切り替える。
+#   - セルには国別・日別の件数を持たせ、LayerControl で国のチェックを外すと
+#     その国を除いた件数で色とツールチップを付け直す (ブラウザ側の JS)
+#   - ズームアウト時に隠すのは戦闘マーカーだけで、部隊の移動経路は国のレイヤーに残す
+
+# (最小ズーム, 最大ズーム, ヘックスの大きさ[度])
+DENSITY_LEVELS = [
+    (0, 3, 4.0),
+    (4, 4, 2.0),
+    (5, 5, 1.0),
+]
+
+# このズーム以上で個別の戦闘マーカーを表示する
+MARKER_MIN_ZOOM = 6
+
+# ツールチップに出す日別内訳の最大日数 (新しい日から)
+TOOLTIP_MAX_DAYS = 10
+
+SQRT3 = math.sqrt(3)
+
+
+def _hex_round(q, r):
+    """ 小数のアキシャル座標を最寄りのヘックスに丸める (キューブ座標経由) """
+    x, z = q, r
+    y = -x - z
+    rx, ry, rz = round(x), round(y), round(z)
+    dx, dy, dz = abs(rx - x), abs(ry - y), abs(rz - z)
+    if dx > dy and dx > dz:
+        rx = -ry - rz
+    elif dy > dz:
+        ry = -rx - rz
+    else:
+        rz = -rx - ry
+    return int(rx), int(rz)
+
+
+def hex_cell(lat, lon, size):
+    """ 緯度経度を平面とみなし、pointy-top ヘックスのアキシャル座標 (q, r) を返す """
+    q = (SQRT3 / 3 * lon - lat / 3) / size
+    r = (2 / 3 * lat) / size
+    return _hex_round(q, r)
+
+
+def hex_polygon(q, r, size):
+    """ ヘックス (q, r) の頂点リストを folium 用の [lat, lon] で返す """
+    center_lon = size * SQRT3 * (q + r / 2)
+    center_lat = size * 1.5 * r
+    corners = []
+    for i in range(6):
+        angle = math.radians(60 * i - 30)
+        corners.append([center_lat + size * math.sin(angle), center_lon + size * math.cos(angle)])
+    return corners
+
+
+def aggregate_density(located_events, levels=DENSITY_LEVELS):
+    """
+    (coords, event) のリストをズームレベルごとにヘックス集計する。
+    戻り値: {size: {(q, r): {'total': n, 'countries': {国: n}, 'days': {日: n}, 'counts': {国: {日: n}}}}}
+    """
+    density = {}
+    for _, _, size in levels:
+        cells = defaultdict(lambda: {'total': 0, 'countries': defaultdict(int), 'days': defaultdict(int),
+                                     'counts': defaultdict(lambda: defaultdict(int))})
+        for coords, event in located_events:
+            cell = cells[hex_cell(coords[0], coords[1], size)]
+            day = event['date_display'].split()[1] if len(event['date_display'].split()) >= 2 else 'Unknown'
+            cell['total'] += 1
+            cell['countries'][event['country']] += 1
+            cell['days'][day] += 1
+            cell['counts'][event['country']][day] += 1
+        density[size] = cells
+    return density
+
+
+def _palette(n=9):
+    """ 色の段階 (件数の log1p を 0〜1 にしたときの色)。JS 側の色付けでも同じものを使う """
+    colormap = linear.YlOrRd_09.scale(0, 1)
+    return [colormap(i / (n - 1)) for i in range(n)]
+
+
+def build_density_layer(cells, size, name, palette):
+    """
+    1つのズーム帯のヘックス集計を FeatureGroup にする。
+    戻り値: (FeatureGroup, GeoJson, 全ての国を数えたときの log1p(件数) の最大値)
+    """
+    fg = folium.FeatureGroup(name=name, control=False)
+    max_log = max((math.log1p(c['total']) for c in cells.values()), default=0.0) or 1.0
+
+    features = []
+    for (q, r), cell in cells.items():
+        ring = [[lon, lat] for lat, lon in hex_polygon(q, r, size)]
+        ring.append(ring[0])
+        color = palette[min(len(palette) - 1, int(math.log1p(cell['total']) / max_log * (len(palette) - 1)))]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+            'properties': {
+                'color': color,
+                'counts': {c: dict(days) for c, days in cell['counts'].items()},
+            },
+        })
+
+    geo = folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        style_function=lambda f: {
+            'fillColor': f['properties']['color'],
+            'color': f['properties']['color'],
+            'weight': 1,
+            'fillOpacity': 0.6,
+        },
+    )
+    geo.add_to(fg)
+    return fg, geo, max_log
+
+
+class ZoomLayerSwitcher(MacroElement):
+    """
+    ズームと国のチェックに合わせて表示を切り替える JS を埋め込む。
+      - 密度レイヤー: ズーム帯ごとに切り替え、チェックされた国だけの件数で色とツールチップを付け直す
+      - 戦闘マーカー: 国がチェックされていて、ズームが marker_min_zoom 以上のときだけ表示
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var palette = {{ this.palette|tojson }};
+            var maxDays = {{ this.max_days }};
+            var bands = [
+                {% for lo, hi, layer, geo, max_log in this.bands %}
+                {lo: {{ lo }}, hi: {{ hi }}, layer: {{ layer.get_name() }}, geo: {{ geo.get_name() }},
+                 maxLog: {{ max_log }}, cells: []},
+                {% endfor %}
+            ];
+            var countries = [
+                {% for name, toggle, markers in this.countries %}
+                {name: {{ name|tojson }}, toggle: {{ toggle.get_name() }}, markers: {{ markers.get_name() }}},
+                {% endfor %}
+            ];
+            bands.forEach(function(b) { b.geo.eachLayer(function(l) { b.cells.push(l); }); });
+
+            function dayKey(d) { return /^\d+$/.test(d) ? [0, parseInt(d, 10)] : [1, 0]; }
+            function tooltip(total, byCountry, byDay) {
+                var lines = ['<b>戦闘数: ' + total + '</b>'];
+                byCountry.sort(function(a, b) { return b[1] - a[1]; }).slice(0, 5).forEach(function(x) {
+                    lines.push(x[0] + ': ' + x[1]);
+                });
+                var days = Object.keys(byDay).sort(function(a, b) {
+                    var ka = dayKey(a), kb = dayKey(b);
+                    return ka[0] - kb[0] || ka[1] - kb[1] || (a < b ? -1 : a > b ? 1 : 0);
+                });
+                lines.push('<b>日別</b>');
+                if (days.length > maxDays) {
+                    lines.push('… (' + (days.length - maxDays) + ' 日分省略)');
+                    days = days.slice(days.length - maxDays);
+                }
+                days.forEach(function(d) { lines.push((/^\d+$/.test(d) ? 'Day ' + d : d) + ': ' + byDay[d]); });
+                return lines.join('<br>');
+            }
+            function restyle(on) {
+                bands.forEach(function(b) {
+                    b.cells.forEach(function(l) {
+                        var counts = l.feature.properties.counts, total = 0, byCountry = [], byDay = {};
+                        Object.keys(counts).forEach(function(c) {
+                            if (!on[c]) { return; }
+                            var n = 0;
+                            Object.keys(counts[c]).forEach(function(d) {
+                                n += counts[c][d];
+                                byDay[d] = (byDay[d] || 0) + counts[c][d];
+                            });
+                            total += n;
+                            byCountry.push([c, n]);
+                        });
+                        if (!total) { b.geo.removeLayer(l); return; }
+                        var i = Math.min(palette.length - 1, Math.floor(Math.log1p(total) / b.maxLog * (palette.length - 1)));
+                        l.setStyle({fillColor: palette[i], color: palette[i]});
+                        l.bindTooltip(tooltip(total, byCountry, byDay), {sticky: true});
+                        if (!b.geo.hasLayer(l)) { b.geo.addLayer(l); }
+                    });
+                });
+            }
+            function update() {
+                var z = map.getZoom(), on = {};
+                countries.forEach(function(c) { on[c.name] = map.hasLayer(c.toggle); });
+                restyle(on);
+                bands.forEach(function(b) {
+                    if (z >= b.lo && z <= b.hi) { map.addLayer(b.layer); }
+                    else { map.removeLayer(b.layer); }
+                });
+                countries.forEach(function(c) {
+                    if (on[c.name] && z >= {{ this.marker_min_zoom }}) { map.addLayer(c.markers); }
+                    else { map.removeLayer(c.markers); }
+                });
+            }
+            map.on('zoomend overlayadd overlayremove', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, bands, countries, palette, marker_min_zoom=MARKER_MIN_ZOOM, max_days=TOOLTIP_MAX_DAYS):
+        super().__init__()
+        self._name = 'ZoomLayerSwitcher'
+        self.bands = bands
+        self.countries = countries
+        self.palette = palette
+        self.marker_min_zoom = marker_min_zoom
+        self.max_days = max_days
+
+
+def add_density_layers(m, located_events, country_layers, levels=DENSITY_LEVELS):
+    """
+    地図に密度レイヤー群とズーム・国の切り替えを追加する。集計結果を返す。
+    country_layers: {国: (LayerControl に出す国のレイヤー, その国の戦闘マーカーのレイヤー)}
+    """
+    density = aggregate_density(located_events, levels)
+    palette = _palette()
+    bands = []
+    for lo, hi, size in levels:
+        fg, geo, max_log = build_density_layer(density[size], size, f"戦闘密度 (z{lo}-{hi})", palette)
+        fg.add_to(m)
+        bands.append((lo, hi, fg, geo, max_log))
+    countries = [(name, toggle, markers) for name, (toggle, markers) in sorted(country_layers.items())]
+    m.add_child(ZoomLayerSwitcher(bands, countries, palette))
+    return density
@@ -0,0 +1,441 @@
+import argparse
+import sys
+
+# =========================================================
+# 統合コマンドライン (python con_cli.py <サブコマンド> ...)
+# =========================================================
+# 各スクリプトは重いライブラリ (pandas / folium / geopy / matplotlib) を
+# 使う関数の中でだけ import するので、ここでもサブコマンドのモジュールは
+# 実行が決まってから import する。missile や units は一瞬で起動する。
+
+
+def make_sampler(args):
+    """ --preview が指定されていれば概算用のサンプラーを作る """
+    if not args.preview:
+        return None
+    import event_sampler
+    return event_sampler.PreviewSampler(args.preview)
+
+
+def cmd_report(args):
+    import analyze_war_log
+    # レポートは損失しか使わないので、撃破・占領の段落は最初から読まない
+    event_filter = analyze_war_log.make_filter(args.only, ['loss'], args.days)
+    sampler = make_sampler(args)
+    all_casualties, _ = analyze_war_log.extract_events(analyze_war_log.get_files(args.dir),
+                                                       event_filter=event_filter, sampler=sampler)
+    if sampler:
+        import event_sampler
+        event_sampler.print_estimate(all_casualties, sampler, args.format, args.out_dir)
+        return
+    analyze_war_log.print_report(all_casualties, args.format, args.out_dir)
+
+
+def cmd_map(args):
+    import analyze_war_log
+    event_filter = analyze_war_log.make_filter(args.only, args.types or ['combat', 'occupy'], args.days)
+    sampler = make_sampler(args)
+    _, all_map_events = analyze_war_log.extract_events(analyze_war_log.get_files(args.dir),
+                                                       event_filter=event_filter, sampler=sampler)
+    note = None
+    if sampler:
+        import event_sampler
+        all_map_events = event_sampler.thin_map_events(all_map_events)
+        note = f"{sampler.label} / 国・日ごとに最大 {event_sampler.MAP_POINTS_PER_STRATUM} 件"
+    analyze_war_log.build_map(all_map_events, args.output, note)
+
+
+def cmd_units(args):
+    import estimate_enemy_unit
+    estimate_enemy_unit.main(args.dir, args.countries, args.format, args.out_dir, args.days)
+
+
+def cmd_lifecycle(args):
+    import unit_lifecycle
+    index = unit_lifecycle.build_index(args.dir, args.countries)
+    if args.alive:
+        day, time_str, t = args.alive
+        unit_lifecycle.print_lives(index.alive_at(t), f"{day}日目 {time_str} に生存していた部隊")
+    if args.created:
+        a, b = args.created
+        lives = index.created_between(unit_lifecycle.game_time(a), unit_lifecycle.game_time(b, "23:59:59"))
+        unit_lifecycle.print_lives(lives, f"{a}〜{b}日目に初確認された部隊")
+    if not args.alive and not args.created:
+        unit_lifecycle.print_lives(sorted(index.lives, key=lambda l: (l.country, -l.number, l.first_seen)), "全部隊")
+
+
+def cmd_territory(args):
+    import territory_timeline
+    timeline = territory_timeline.build_timeline(args.dir, args.snapshot_hours)
+    if args.at:
+        day, time_str, t = args.at
+        state = timeline.state_at(t)
+        territory_timeline.print_state(state, f"{day}日目 {time_str} の支配図")
+    if args.changes is not None:
+        territory_timeline.print_changes(timeline.changes_on_day(args.changes), f"{args.changes}日目に支配者が変わった州")
+    if not args.at and args.changes is None:
+        territory_timeline.print_state(timeline.state, "最新の支配図")
+
+
+def cmd_near(args):
+    import analyze_war_log
+    import spatial_index
+    center = analyze_war_log.get_lat_lon(args.province)
+    if not center:
+        print(f"座標が分かりません: {args.province}")
+        return
+    index = spatial_index.build_index(args.dir)
+    if args.at:
+        now = args.at[2]
+    else:
+        now = index.latest_time()
+    if now is None:
+        print("座標の分かるイベントがありません")
+        return
+    since = now - int(args.hours * 3600)
+    excluded = set(args.exclude) | {analyze_war_log.translate(c) for c in args.exclude}
+    keep = lambda ev: ev['country'] not in excluded
+
+    if args.radius:
+        results = index.radius(center[0], center[1], args.radius, since, now, keep)
+    else:
+        results = index.nearest(center[0], center[1], args.k, since, now, keep)
+    if not args.all_sightings:
+        results = spatial_index.latest_by_unit(results)
+    spatial_index.print_sightings(results, f"{args.province} 付近 (直近 {args.hours:g} 時間)")
+
+
+def cmd_activity(args):
+    import plot_battle_time
+    if args.all:
+        # 全攻撃国のグラフを画面表示なしでファイルに出力する
+        import analyze_war_log
+        sampler = make_sampler(args)
+        # 他の集計と同じ除外リスト (Undead など) を使い、除外国のグラフは作らない
+        event_filter = analyze_war_log.make_filter(event_types=['combat'], day_range=args.days)
+        combat_events = plot_battle_time.extract_combat_events(
+            plot_battle_time.get_files(args.dir), event_filter=event_filter, sampler=sampler)
+        note = sampler.label_en if sampler else None
+        times_by_country = plot_battle_time.group_by_attacker(
+            combat_events, game_speed=args.speed, ref_real_time_str=args.ref_real,
+            ref_game_day=args.ref_day, ref_game_time_str=args.ref_time)
+        if args.grid:
+            import os
+            os.makedirs(args.out_dir, exist_ok=True)
+            path = plot_battle_time.render_grid(
+                times_by_country, os.path.join(args.out_dir, f"activity_all.{args.format}"), min_events=args.min_events,
+                note=note)
+            print(f"保存しました: {path}")
+        else:
+            paths = plot_battle_time.render_all(times_by_country, args.out_dir, args.format, args.workers,
+                                                args.min_events, note)
+            print(f"{len(paths)} 件のグラフを保存しました: {args.out_dir}")
+        return
+
+    if not args.country:
+        print("攻撃側の国名を指定してください (全ての国なら --all)")
+        return
+    sampler = make_sampler(args)
+    combat_times = plot_battle_time.load_data(
+        args.dir, args.country, args.speed,
+        args.ref_real, args.ref_day, args.ref_time, args.days, sampler)
+    plot_battle_time.analyze_and_plot(combat_times, args.country, sampler.label_en if sampler else None)
+
+
+def cmd_clock(args):
+    import date_analysis
+    points = date_analysis.DEFAULT_POINTS
+    if args.point:
+        points = []
+        for p in args.point:
+            real_time_str, game_day, game_time_str = [x.strip() for x in p.split(',')]
+            points.append((real_time_str, int(game_day), game_time_str))
+    date_analysis.main(points, args.speed)
+
+
+def cmd_missile(args):
+    import misile_time
+    misile_time.main(args.src[0], args.src[1], args.dst[0], args.dst[1],
+                     args.speed, args.aa_range, args.aa_trigger, args.buffer)
+
+
+def cmd_serve(args):
+    import query_server
+    query_server.run_server(args.dir, args.host, args.port, args.interval)
+
+
+def cmd_query(args):
+    import json
+    import query_server
+    try:
+        result = query_server.query(args.endpoint, args.host, args.port,
+                                    day=args.day, time=args.time, country=args.country, speed=args.speed,
+                                    ref_real=args.ref_real, ref_day=args.ref_day, ref_time=args.ref_time)
+    except query_server.QueryError as e:
+        sys.exit(f"エラー: {e}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def _same_setting(saved, value):
+    """ .npz に文字列で保存した設定値と比べる (数値は '4' と 4.0 を同じとみなす) """
+    if saved is None:
+        return False
+    if isinstance(value, (int, float)):
+        try:
+            return float(saved) == float(value)
+        except ValueError:
+            return False
+    return saved == str(value)
+
+
+def cmd_cube(args):
+    import os
+    import activity_cube
+    import analyze_war_log
+    import plot_battle_time
+    if args.build or not os.path.exists(args.file):
+        # activity --all と同じく、除外国 (Undead / AI など) の行は作らない
+        combat_events = plot_battle_time.extract_combat_events(
+            plot_battle_time.get_files(args.dir), event_filter=analyze_war_log.make_filter(event_types=['combat']))
+        cube = activity_cube.ActivityCube.build(combat_events, with_victim=args.with_victim, game_speed=args.speed,
+                                                ref_real_time_str=args.ref_real, ref_game_day=args.ref_day,
+                                                ref_game_time_str=args.ref_time)
+        cube.save(args.file)
+        print(f"保存しました: {args.file} (攻撃国 {len(cube.attackers)}, 日数 {len(cube.dates)})")
+    else:
+        cube = activity_cube.ActivityCube.load(args.file)
+        wanted = {'game_speed': args.speed, 'ref_real_time': args.ref_real,
+                  'ref_game_day': args.ref_day, 'ref_game_time': args.ref_time}
+        if not all(_same_setting(cube.meta.get(k), v) for k, v in wanted.items()):
+            print(f"注意: {args.file} は別の換算設定で作られています ({cube.meta})。--build で作り直してください。")
+
+    if not args.countries:
+        for country, n in sorted(cube.totals().items(), key=lambda x: x[1], reverse=True):
+            print(f"{country}: {n}")
+    for country in args.countries:
+        activity_cube.print_country(cube, country, args.victim)
+
+
+def cmd_exchange(args):
+    import exchange_matrix
+    import plot_battle_time
+    from event_filter import EventFilter
+    matrix = exchange_matrix.ExchangeMatrix()
+    # K/D は撃破と被撃破の両方が要るので、国では絞らず日数だけ絞る
+    plot_battle_time.extract_combat_events(plot_battle_time.get_files(args.dir), matrix=matrix,
+                                           event_filter=EventFilter(event_types=['combat'], day_range=args.days))
+    if not args.countries:
+        exchange_matrix.print_summary(matrix)
+    for country in args.countries:
+        exchange_matrix.print_country(matrix, country, args.limit)
+
+
+def cmd_archive(args):
+    import event_archive
+    archive = event_archive.EventArchive(args.root)
+    if args.action == 'add':
+        for target_dir in args.targets:
+            added = archive.ingest(target_dir, args.game if len(args.targets) == 1 else None)
+            print(f"{target_dir}: " + ", ".join(f"{t} {n} 件" for t, n in added.items()))
+    elif args.action == 'list':
+        for game in archive.games():
+            days = sorted(archive.game_days([game])[game])
+            span = f"{days[0]}〜{days[-1]} 日目" if days else "日数不明"
+            print(f"{game}: {span} ({len(days)} 日)")
+    else:
+        table, column = {'losses': ('losses', None), 'kills': ('combats', 'attacker'),
+                         'killed': ('combats', 'victim'), 'occupations': ('occupations', None)}[args.metric]
+        for country in args.targets:
+            event_archive.print_average(archive, table, country, args.games, args.days, column)
+
+
+class GameTimeAction(argparse.Action):
+    """ DAY [HH:MM:SS] を検証して (日, 時刻, 通算秒) にする。時刻の省略時はその日の終わり """
+    default_time = "23:59:59"
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from query_server import _parse_day, _parse_clock
+        if len(values) > 2:
+            parser.error(f"{option_string}: DAY [HH:MM:SS] の形式で指定してください")
+        time_str = values[1] if len(values) > 1 else self.default_time
+        try:
+            day = _parse_day(values[0])
+            seconds = _parse_clock(time_str)
+        except ValueError as e:
+            parser.error(f"{option_string}: {e}")
+        setattr(namespace, self.dest, (day, time_str, day * 86400 + seconds))
+
+
+class DayStartAction(GameTimeAction):
+    """ 時刻の省略時はその日の始まり """
+    default_time = "00:00:00"
+
+
+def add_days_arg(p):
+    p.add_argument('--days', type=int, nargs=2, metavar=('FIRST', 'LAST'),
+                   help='ゲーム内日数で絞り込む (両端を含む)。範囲外のファイル・記事は解析しない')
+
+
+def add_clock_args(p):
+    """ ゲーム内時刻 → 現実時刻の換算 (activity / cube で共通) """
+    p.add_argument('--speed', type=float, default=4.0, help='ゲームスピード')
+    p.add_argument('--ref-real', default='2026-01-02 00:11:00', help='基準点の現実日時 (YYYY-MM-DD HH:MM:SS)')
+    p.add_argument('--ref-day', type=int, default=37, help='基準点のゲーム内日数')
+    p.add_argument('--ref-time', default='23:57:00', help='基準点のゲーム内時刻 (HH:MM:SS)')
+
+
+def add_preview_arg(p):
+    p.add_argument('--preview', type=float, metavar='RATE',
+                   help='記事の一部 (例: 0.1 = 10%%) だけを解析して概算を出す (大きなログの下見用)')
+
+
+def add_format_args(p):
+    p.add_argument('--format', nargs='+', choices=['text', 'md', 'csv', 'json'],
+                   help='ファイルにも書き出す形式 (複数指定可)')
+    p.add_argument('--out-dir', default='reports', help='--format の出力フォルダ')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Conflict of Nations 新聞ログ解析ツール")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('report', help='死亡数集計レポートを表示')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--only', nargs='+', help='被害国で絞り込む (英語・日本語どちらでも可)')
+    add_days_arg(p)
+    add_preview_arg(p)
+    add_format_args(p)
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser('map', help='戦況地図 (HTML) を生成')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--output', default='war_map_con_wiki.html', help='出力ファイル')
+    p.add_argument('--only', nargs='+', help='攻撃国で絞り込む (英語・日本語どちらでも可)')
+    p.add_argument('--types', nargs='+', choices=['combat', 'occupy'], help='表示するイベントの種類')
+    add_days_arg(p)
+    add_preview_arg(p)
+    p.set_defaults(func=cmd_map)
+
+    p = sub.add_parser('units', help='部隊番号による戦力推定リスト')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--countries', nargs='*', default=[], help='絞り込む国名 (省略時は全ての国)')
+    add_days_arg(p)
+    add_format_args(p)
+    p.set_defaults(func=cmd_units)
+
+    p = sub.add_parser('lifecycle', help='部隊ごとの初確認・名前の変化・撃破 (生存区間)')
+    p.add_argument('countries', nargs='*', help='絞り込む国名 (省略時は全ての国)')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--alive', nargs='+', action=DayStartAction, metavar='DAY [HH:MM:SS]',
+                   help='この時点で生存していた部隊 (時刻の省略時はその日の始まり)')
+    p.add_argument('--created', type=int, nargs=2, metavar=('FIRST', 'LAST'), help='この日数の間に初確認された部隊')
+    p.set_defaults(func=cmd_lifecycle)
+
+    p = sub.add_parser('territory', help='州の支配者の移り変わり (占領イベントから)')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--at', nargs='+', action=GameTimeAction, metavar='DAY [HH:MM:SS]',
+                   help='この時点の支配図 (時刻の省略時はその日の終わり)')
+    p.add_argument('--changes', type=int, metavar='DAY', help='この日に支配者が変わった州')
+    p.add_argument('--snapshot-hours', type=float, default=6, help='スナップショットを残す間隔 (ゲーム内の時間)')
+    p.set_defaults(func=cmd_territory)
+
+    p = sub.add_parser('near', help='州の近くで最近目撃された部隊 (k 近傍 / 半径検索)')
+    p.add_argument('province', help='中心にする州名 (data-prov-name)')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--hours', type=float, default=24, help='何時間前までの目撃を対象にするか (ゲーム内の時間)')
+    p.add_argument('--at', nargs='+', action=GameTimeAction, metavar='DAY [HH:MM:SS]',
+                   help='基準の時刻 (省略時は最新のイベント。時刻の省略時はその日の終わり)')
+    p.add_argument('--k', type=int, default=10, help='近い順に何件まで')
+    p.add_argument('--radius', type=float, help='指定すると k 件ではなくこの半径 (km) 以内を全て表示')
+    p.add_argument('--exclude', nargs='*', default=[], help='除外する国 (自国など)')
+    p.add_argument('--all-sightings', action='store_true', help='同じ部隊の目撃をまとめずに全て表示')
+    p.set_defaults(func=cmd_near)
+
+    p = sub.add_parser('activity', help='攻撃国のアクティブ時間帯をプロット')
+    p.add_argument('country', nargs='?', help="攻撃側の国名 (例: 'Sudan')")
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    add_clock_args(p)
+    p.add_argument('--all', action='store_true', help='全攻撃国のグラフをファイルに出力 (画面表示なし)')
+    p.add_argument('--grid', action='store_true', help='--all: 1枚の一覧画像にまとめる')
+    p.add_argument('--out-dir', default='activity_charts', help='--all: 出力フォルダ')
+    p.add_argument('--format', default='png', choices=['png', 'svg'], help='--all: 画像形式')
+    p.add_argument('--workers', type=int, default=None, help='--all: 並列プロセス数')
+    p.add_argument('--min-events', type=int, default=1, help='--all: この件数未満の国は出力しない')
+    add_days_arg(p)
+    add_preview_arg(p)
+    p.set_defaults(func=cmd_activity)
+
+    p = sub.add_parser('cube', help='全攻撃国の活動キューブ (国×日付×時刻) を作成・参照')
+    p.add_argument('countries', nargs='*', help='表示する攻撃国 (省略時は国別の合計)')
+    p.add_argument('--build', action='store_true', help='ログを解析してキューブを作り直す')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--file', default='activity_cube.npz', help='キューブの保存先')
+    add_clock_args(p)
+    p.add_argument('--with-victim', action='store_true', help='被害国の軸も持たせる')
+    p.add_argument('--victim', help='被害国で絞り込む (--with-victim で作ったキューブのみ)')
+    p.set_defaults(func=cmd_cube)
+
+    p = sub.add_parser('exchange', help='攻撃国×兵種×被害国×兵種の交換比 (K/D) を表示')
+    p.add_argument('countries', nargs='*', help='詳細を表示する国 (省略時は全ての国の K/D 一覧)')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--limit', type=int, default=15, help='国ごとに表示する組み合わせの数')
+    add_days_arg(p)
+    p.set_defaults(func=cmd_exchange)
+
+    p = sub.add_parser('archive', help='複数ゲームのイベントアーカイブに追記・集計')
+    p.add_argument('action', choices=['add', 'list', 'avg'], help='add: フォルダを取り込む / list: ゲーム一覧 / avg: 1日あたりの平均')
+    p.add_argument('targets', nargs='*', help='add: 取り込むフォルダ / avg: 国名')
+    p.add_argument('--root', default='event_archive', help='アーカイブの保存先')
+    p.add_argument('--game', help='add: ゲーム ID (省略時はフォルダ名)')
+    p.add_argument('--metric', default='losses', choices=['losses', 'kills', 'killed', 'occupations'],
+                   help='avg: 損失数 / 撃破数 / 被撃破数 / 占領数')
+    p.add_argument('--games', nargs='+', help='avg: 対象のゲーム (省略時は全て)')
+    add_days_arg(p)
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser('clock', help='ゲーム内時間のズレを検証')
+    p.add_argument('--point', action='append',
+                   help="'現実日時,ゲーム内日数,ゲーム内時刻' (複数指定可。省略時は date_analysis.py の値)")
+    p.add_argument('--speed', type=float, default=None, help='想定している倍率')
+    p.set_defaults(func=cmd_clock)
+
+    p = sub.add_parser('missile', help='ミサイルの発射タイミングを計算')
+    p.add_argument('--src', type=float, nargs=2, metavar=('X', 'Y'), default=[6269, 3357], help='発射地点')
+    p.add_argument('--dst', type=float, nargs=2, metavar=('X', 'Y'), default=[6009, 4586], help='目標地点')
+    p.add_argument('--speed', type=float, default=35, help='ミサイルの速度 (距離/分)')
+    p.add_argument('--aa-range', type=float, default=50, help='敵の対空範囲')
+    p.add_argument('--aa-trigger', type=int, default=4, help='敵が対空を行う分の1の位')
+    p.add_argument('--buffer', type=int, default=2, help='対空後、何分待ってから突入するか')
+    p.set_defaults(func=cmd_missile)
+
+    p = sub.add_parser('serve', help='解析結果をメモリに保持する常駐クエリサーバーを起動')
+    p.add_argument('--dir', default='data_zombi', help='解析対象のフォルダ')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--interval', type=float, default=30, help='新しいファイルを確認する間隔 (秒)')
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('query', help='常駐サーバーに問い合わせる')
+    p.add_argument('endpoint', choices=['report', 'units', 'activity', 'exchange', 'territory', 'changes',
+                                        'refresh', 'status'])
+    p.add_argument('--day', help='report / territory / changes: ゲーム内日数 (report の省略時は総合計)')
+    p.add_argument('--time', help='territory: ゲーム内時刻 (HH:MM:SS)')
+    p.add_argument('--country', help='units / activity / exchange: 国名')
+    p.add_argument('--speed', type=float, help='activity: ゲームスピード')
+    p.add_argument('--ref-real', help='activity: 基準点の現実日時 (YYYY-MM-DD HH:MM:SS)')
+    p.add_argument('--ref-day', type=int, help='activity: 基準点のゲーム内日数')
+    p.add_argument('--ref-time', help='activity: 基準点のゲーム内時刻 (HH:MM:SS)')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8765)
+    p.set_defaults(func=cmd_query)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -116,25 +116,27 @@ class GameTimeVerifier:
 
 # --- 実行部分 ---
 
-verifier = GameTimeVerifier()
-
 # 使い方:
-# verifier.add_point('現実の日時', ゲーム内日数, 'ゲーム内時刻')
-
-#verifier.add_point('2026-01-02 00:11:00', 37, '23:57:00')
-
-verifier.add_point("2025-12-30 21:31:00", 25, "14:16:00")
-
-verifier.add_point("2025-12-31 20:27:00", 29, "09:03:00")
-
-verifier.add_point("2026-01-01 02:36:00", 30, "09:36:00")
-
-verifier.add_point("2026-01-01 16:19:00", 32, "17:27:00")
-
-verifier.add_point('2026-01-03 14:42:00', 40, '11:02:00')
-
-verifier.add_point("2026-01-03 14:47:00", 40, "11:21:00")
-
-verifier.add_point('2026-01-03 14:52:00', 40, '11:41:00')
-
-verifier.verify()
\ No newline at end of file
+# DEFAULT_POINTS に ('現実の日時', ゲーム内日数, 'ゲーム内時刻') を追加する
+
+DEFAULT_POINTS = [
+    #('2026-01-02 00:11:00', 37, '23:57:00'),
+    ("2025-12-30 21:31:00", 25, "14:16:00"),
+    ("2025-12-31 20:27:00", 29, "09:03:00"),
+    ("2026-01-01 02:36:00", 30, "09:36:00"),
+    ("2026-01-01 16:19:00", 32, "17:27:00"),
+    ('2026-01-03 14:42:00', 40, '11:02:00'),
+    ("2026-01-03 14:47:00", 40, "11:21:00"),
+    ('2026-01-03 14:52:00', 40, '11:41:00'),
+]
+
+def main(points=DEFAULT_POINTS, target_speed=None):
+    verifier = GameTimeVerifier()
+    if target_speed is not None:
+        verifier.TARGET_SPEED = target_speed
+    for real_time_str, game_day, game_time_str in points:
+        verifier.add_point(real_time_str, game_day, game_time_str)
+    verifier.verify()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import bs4
-from bs4 import BeautifulSoup
 import re
-import pandas as pd
 import os
 import glob
+from event_dedup import EventDeduplicator
+from newspaper_stream import iter_articles
+from event_filter import EventFilter
+import locale_patterns
+import report_writer
 
 # =========================================================
 # [ユーザー設定エリア]
@@ -129,8 +132,8 @@ def translate(text):
 # メイン処理
 # =========================================================
 
-def get_files():
-    files_path = os.path.join(TARGET_DIR, FILE_PATTERN)
+def get_files(target_dir=TARGET_DIR):
+    files_path = os.path.join(target_dir, FILE_PATTERN)
     return glob.glob(files_path)
 
 def parse_time(date_str):
@@ -143,10 +146,20 @@ def parse_time(date_str):
         return day * 86400 + h * 3600 + m * 60 + s
     return 0
 
-def extract_units(files):
+def make_filter(target_countries=TARGET_COUNTRIES, day_range=None):
+    """ 対象国・除外リスト・翻訳辞書を組み込んだ EventFilter を作る """
+    return EventFilter(target_countries, EXCLUDED_COUNTRIES, day_range=day_range, aliases=TRANSLATION_DICT)
+
+def extract_units(files, target_countries=TARGET_COUNTRIES, dedup=None, event_filter=None):
     unit_records = []
+    # 重複ファイルに入っている同じイベントは1回だけ解析する
+    if dedup is None:
+        dedup = EventDeduplicator.for_files(files)
+    # 対象国・除外国は翻訳の前、対象国が出てこない記事は BeautifulSoup にする前に落とす
+    if event_filter is None:
+        event_filter = make_filter(target_countries)
     
-    # 正規表現パターンの修正
+    # 正規表現パターンの修正 (locale_patterns.py の 'unit'。クライアントの言語ごとに持つ)
     # ---------------------------------------------------------
     # 解説:
     # 1. (?:The\s+|by\s+the\s+)? 
@@ -162,31 +175,38 @@ def extract_units(files):
     # 6. \s+\(([^)]+)\)
     #    -> 空白 + "(" + 国名(キャプチャグループ4) + ")"
     # ---------------------------------------------------------
-    regex_unit = re.compile(r'(?:The\s+|by\s+the\s+)?(\d+)(st|nd|rd|th)\s+([^(]+?)\s+\(([^)]+)\)')
-
-    for file_path in files:
+    for file_path in dedup.order_files(files):
         if not os.path.exists(file_path): continue
+        if dedup.should_skip_file(file_path): continue
+        if not event_filter.file_may_match(file_path, dedup): continue
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            try:
-                soup = BeautifulSoup(f, 'html.parser')
-            except:
-                continue
-
-        articles = soup.find_all('div', class_='newspaper_article')
+        # ファイル全体を読み込まず、記事を1件ずつ取り出して解析する
+        dedup.begin_file(file_path)
+        pack = locale_patterns.pack_for_file(file_path)
+        regex_unit = pack.regex['unit']
         
-        for article in articles:
+        for article in iter_articles(file_path, raw_filter=event_filter.article_may_match):
             body = article.find('div', class_='newspaper_body')
             if not body: continue
             
             paragraphs = body.find_all('p')
             for p in paragraphs:
-                text = p.get_text().strip()
-                
                 date_span = p.find('span', class_='event_time')
                 date_str = date_span.get_text().strip() if date_span else "Unknown"
+                if not event_filter.date_ok(date_str) or not event_filter.links_may_match(p): continue
+
+                text = p.get_text().strip()
+                if dedup.is_duplicate(date_str, text): continue
                 time_val = parse_time(date_str)
 
+                # 撃破の段落なら、文言より前に出てくる部隊が撃破された側
+                parts = pack.split_destroyed(text)
+                victim_end = len(parts[0]) if parts else -1
+                destroyed_by = None
+                if parts:
+                    attacker_match = pack.regex['attacker'].search(text)
+                    destroyed_by = translate(attacker_match.group(2).strip()) if attacker_match else "Unknown"
+
                 # 正規表現検索を実行
                 matches = regex_unit.finditer(text)
                 for m in matches:
@@ -195,16 +215,13 @@ def extract_units(files):
                     unit_name_raw = m.group(3).strip() # 兵種名
                     country_raw = m.group(4).strip() # 国名
                     
+                    # --- 国フィルタリング (兵種名の翻訳より先に行う) ---
+                    if event_filter.is_excluded(country_raw):
+                        continue
                     country_jp = translate(country_raw)
-                    unit_name_jp = translate(unit_name_raw)
-
-                    # --- 国フィルタリング ---
-                    if country_raw in EXCLUDED_COUNTRIES or country_jp in EXCLUDED_COUNTRIES:
+                    if not event_filter.country_ok(country_raw, country_jp):
                         continue
-                    
-                    if TARGET_COUNTRIES:
-                        if (country_raw not in TARGET_COUNTRIES) and (country_jp not in TARGET_COUNTRIES):
-                            continue
+                    unit_name_jp = translate(unit_name_raw)
 
                     unit_records.append({
                         'Country': country_jp,
@@ -212,53 +229,55 @@ def extract_units(files):
                         'UnitName': unit_name_jp,
                         'TimeVal': time_val,
                         'LastSeen': date_str,
-                        'RawText': f"{unit_num_str}{m.group(2)} {unit_name_raw}"
+                        'RawText': f"{unit_num_str}{m.group(2)} {unit_name_raw}",
+                        'Destroyed': m.start() < victim_end,
+                        'DestroyedBy': destroyed_by if m.start() < victim_end else None,
                     })
 
-    return pd.DataFrame(unit_records)
+        if event_filter.prunes:
+            dedup.discard_file()
+        else:
+            dedup.end_file()
+
+    if dedup.autosave:
+        dedup.save()
+    return unit_records
+
+def latest_sightings(unit_records):
+    """ 重複排除: 同じ国・番号なら最新のログを残す。{国: [レコード(番号の大きい順)]} を返す """
+    latest = {}
+    for rec in unit_records:
+        key = (rec['Country'], rec['UnitNumber'])
+        if key not in latest or rec['TimeVal'] > latest[key]['TimeVal']:
+            latest[key] = rec
 
-def main():
-    input_files = get_files()
+    by_country = {}
+    for (country, _), rec in latest.items():
+        by_country.setdefault(country, []).append(rec)
+    for recs in by_country.values():
+        recs.sort(key=lambda r: r['UnitNumber'], reverse=True)
+    return by_country
+
+def main(target_dir=TARGET_DIR, target_countries=TARGET_COUNTRIES, formats=None, out_dir='reports', day_range=None):
+    input_files = get_files(target_dir)
     print(f"解析対象ファイル数: {len(input_files)}")
     
-    if TARGET_COUNTRIES:
-        print(f"絞り込み対象国: {TARGET_COUNTRIES}")
+    if target_countries:
+        print(f"絞り込み対象国: {target_countries}")
     else:
         print("絞り込みなし（全対象国を表示）")
 
-    df = extract_units(input_files)
+    records = extract_units(input_files, target_countries, event_filter=make_filter(target_countries, day_range))
     
-    if df.empty:
+    if not records:
         print("\n該当する部隊情報が見つかりませんでした。")
         return
 
-    # 重複排除: 同じ国・番号なら最新のログを残す
-    df_sorted = df.sort_values(by=['Country', 'UnitNumber', 'TimeVal'], ascending=[True, True, False])
-    df_unique = df_sorted.drop_duplicates(subset=['Country', 'UnitNumber'], keep='first')
-
-    countries = df_unique['Country'].unique()
-    
-    print("\n" + "="*50)
-    print("【部隊番号による戦力推定リスト (修正版)】")
-    print("確認された部隊番号を大きい順に列挙します。")
-    print("="*50)
-
-    for country in sorted(countries):
-        country_df = df_unique[df_unique['Country'] == country]
-        country_df = country_df.sort_values(by='UnitNumber', ascending=False)
-        
-        max_num = country_df['UnitNumber'].max()
-        count = len(country_df)
-        
-        print(f"\n■ {country} (確認数: {count}, 最大番号: {max_num})")
-        print(f"{'番号':<6} | {'現在の部隊名 (推定)':<25} | {'最終確認日時'}")
-        print("-" * 60)
-        
-        for _, row in country_df.iterrows():
-            u_num = row['UnitNumber']
-            u_name = row['UnitName']
-            l_seen = row['LastSeen']
-            print(f"#{u_num:<5} | {u_name:<32} | {l_seen}")
+    by_country = latest_sightings(records)
+    report_writer.print_chat(unit_summary=by_country)
+    if formats:
+        for path in report_writer.write_reports(formats, out_dir, unit_summary=by_country, basename='units'):
+            print(f"保存しました: {path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
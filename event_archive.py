@@ -0,0 +1,242 @@
+import json
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# =========================================================
+# 複数ゲームのイベントアーカイブ (ゲーム × ゲーム内日数で分割)
+# =========================================================
+# ゲームごとのフォルダ (data_zombi など) から抽出したイベントを、追記のみのアーカイブに
+# 列ごとの NumPy 配列 (.npz) として保存する。
+#
+#   event_archive/
+#     index.json                       パーティションの一覧と小さな索引 (日時の最小・最大, 国)
+#     <ゲーム>/day_0036/losses-0001.npz
+#     <ゲーム>/day_0036/combats-0001.npz
+#     <ゲーム>/keys-0001.npy           取り込み済みイベントのハッシュ (再取り込み時の重複排除用)
+#
+# 取り込みのたびに新しいファイルを足すだけで、既存のファイルは書き換えない。
+# 集計は index.json だけで対象のパーティションを選び、必要な .npz だけを読む (HTML は読まない)。
+
+DEFAULT_ARCHIVE_DIR = "event_archive"
+INDEX_FILE_NAME = "index.json"
+
+# テーブルごとの列と、国で絞り込むときに見る列
+TABLES = {
+    'losses': {'columns': ['day', 'country', 'unit', 'count'], 'country_columns': ['country']},
+    'combats': {'columns': ['sort_key', 'attacker', 'attacker_unit', 'victim', 'victim_unit'],
+                'country_columns': ['attacker', 'victim']},
+    'occupations': {'columns': ['sort_key', 'country', 'unit', 'location'], 'country_columns': ['country']},
+}
+
+# 日数が読めないイベントは day 0 のパーティションに入れる
+UNKNOWN_DAY = 0
+
+_INT_COLUMNS = {'day', 'count', 'sort_key'}
+
+
+def _safe_name(name):
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name)
+
+
+def _day_of_label(day_label):
+    """ 'Day 36' -> 36 """
+    last = str(day_label).split()[-1] if day_label else ''
+    return int(last) if last.isdigit() else UNKNOWN_DAY
+
+
+class EventArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_FILE_NAME)
+        self.index = {'partitions': [], 'keys': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def games(self):
+        return sorted({p['game'] for p in self.index['partitions']})
+
+    # -----------------------------------
+    # 取り込み
+    # -----------------------------------
+    def _known_keys(self, game):
+        keys = set()
+        for rel in self.index['keys'].get(game, []):
+            keys.update(np.load(os.path.join(self.root, rel)).tolist())
+        return keys
+
+    def _next_seq(self, game):
+        return len(self.index['keys'].get(game, [])) + 1
+
+    def _write_partition(self, game, day, table, rows, seq):
+        columns = TABLES[table]['columns']
+        arrays = {}
+        for col in columns:
+            values = [r[col] for r in rows]
+            arrays[col] = np.array(values, dtype=np.int64 if col in _INT_COLUMNS else str)
+
+        rel = os.path.join(_safe_name(game), f"day_{day:04d}", f"{table}-{seq:04d}.npz")
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, **arrays)
+
+        countries = sorted({r[c] for r in rows for c in TABLES[table]['country_columns']})
+        entry = {'game': game, 'day': day, 'table': table, 'path': rel, 'rows': len(rows), 'countries': countries}
+        if 'sort_key' in arrays:
+            entry['min'] = int(arrays['sort_key'].min())
+            entry['max'] = int(arrays['sort_key'].max())
+        self.index['partitions'].append(entry)
+
+    def ingest(self, target_dir, game=None):
+        """
+        フォルダの新聞ログを解析して追記する。game を省略するとフォルダ名をゲーム ID にする。
+        前回までに取り込んだイベントは数えない。戻り値: {テーブル: 追加した行数}
+        """
+        import analyze_war_log
+        import plot_battle_time
+        from event_dedup import EventDeduplicator
+
+        game = game or os.path.basename(os.path.normpath(target_dir))
+        known = self._known_keys(game)
+        input_files = analyze_war_log.get_files(target_dir)
+
+        # アーカイブ済みのイベントを「既に数えた」ことにして抽出する
+        dedups = [EventDeduplicator(), EventDeduplicator()]
+        for dedup in dedups:
+            dedup.seen = set(known)
+        casualties, map_events = analyze_war_log.extract_events(
+            input_files, dedup=dedups[0], event_filter=analyze_war_log.make_filter(event_types=['loss', 'occupy']))
+        combat_events = plot_battle_time.extract_combat_events(
+            input_files, dedup=dedups[1], event_filter=analyze_war_log.make_filter(event_types=['combat']))
+
+        by_partition = defaultdict(list)
+        for rec in casualties:
+            by_partition[(_day_of_label(rec['Day']), 'losses')].append(
+                {'day': _day_of_label(rec['Day']), 'country': rec['Country'], 'unit': rec['Unit'], 'count': rec['Count']})
+        for ev in map_events:
+            if ev['type'] == 'occupy':
+                by_partition[(ev['sort_key'] // 86400, 'occupations')].append(
+                    {'sort_key': ev['sort_key'], 'country': ev['country'], 'unit': ev['unit_name'], 'location': ev['location']})
+        for ev in combat_events:
+            sort_key = plot_battle_time.parse_game_total_seconds(ev['game_day'], ev['game_time']) or 0
+            by_partition[(sort_key // 86400, 'combats')].append(
+                {'sort_key': sort_key, 'attacker': ev['attacker'], 'attacker_unit': ev['attacker_unit'],
+                 'victim': ev['victim'], 'victim_unit': ev['victim_unit']})
+
+        new_keys = (dedups[0].seen | dedups[1].seen) - known
+        added = {table: 0 for table in TABLES}
+        if not new_keys:
+            return added
+
+        seq = self._next_seq(game)
+        for (day, table), rows in sorted(by_partition.items()):
+            self._write_partition(game, day, table, rows, seq)
+            added[table] += len(rows)
+
+        rel = os.path.join(_safe_name(game), f"keys-{seq:04d}.npy")
+        np.save(os.path.join(self.root, rel), np.array(sorted(new_keys), dtype=np.uint64))
+        self.index['keys'].setdefault(game, []).append(rel)
+        self._save_index()
+        return added
+
+    # -----------------------------------
+    # 参照 (index.json で絞ってから .npz を読む)
+    # -----------------------------------
+    def partitions(self, table, games=None, day_range=None, countries=None):
+        """ 条件に合う可能性のあるパーティションだけを返す (ファイルは開かない) """
+        result = []
+        for p in self.index['partitions']:
+            if p['table'] != table:
+                continue
+            if games and p['game'] not in games:
+                continue
+            if day_range and not (day_range[0] <= p['day'] <= day_range[1]):
+                continue
+            if countries and not set(countries) & set(p['countries']):
+                continue
+            result.append(p)
+        return result
+
+    def game_days(self, games=None, day_range=None):
+        """ ゲームごとの、何かしらのイベントが記録されている日数の集合 """
+        days = defaultdict(set)
+        for p in self.index['partitions']:
+            if p['day'] == UNKNOWN_DAY or (games and p['game'] not in games):
+                continue
+            if day_range and not (day_range[0] <= p['day'] <= day_range[1]):
+                continue
+            days[p['game']].add(p['day'])
+        return days
+
+    def read(self, table, columns=None, games=None, day_range=None, countries=None):
+        """ 条件に合う行を列ごとの配列で返す。'game' と 'day' の列を付ける """
+        columns = columns or TABLES[table]['columns']
+        chunks = defaultdict(list)
+        for p in self.partitions(table, games, day_range, countries):
+            with np.load(os.path.join(self.root, p['path'])) as data:
+                for col in columns:
+                    if col != 'day':
+                        chunks[col].append(data[col])
+            chunks['game'].append(np.full(p['rows'], p['game']))
+            chunks['day'].append(np.full(p['rows'], p['day'], dtype=np.int64))
+        return {col: np.concatenate(arrs) if arrs else np.array([]) for col, arrs in chunks.items()}
+
+    def daily_totals(self, table, country_names, games=None, day_range=None, column=None):
+        """
+        {(ゲーム, 日): 件数} を返す。losses は損失数 (count) の合計、ほかは行数。
+        column: 国を見る列 (combats なら 'attacker' で撃破数、'victim' で被撃破数)
+        """
+        column = column or TABLES[table]['country_columns'][0]
+        names = set(country_names)
+        value_col = ['count'] if 'count' in TABLES[table]['columns'] else []
+        data = self.read(table, [column] + value_col, games, day_range, names)
+        totals = defaultdict(int)
+        if not len(data.get(column, [])):
+            return totals
+        mask = np.isin(data[column], list(names))
+        values = data['count'][mask] if value_col else np.ones(int(mask.sum()), dtype=np.int64)
+        for game, day, n in zip(data['game'][mask].tolist(), data['day'][mask].tolist(), values.tolist()):
+            totals[(game, day)] += n
+        return totals
+
+    def average_per_day(self, table, country_names, games=None, day_range=None, column=None):
+        """
+        ゲームごとの「1日あたりの数」。分母はそのゲームでイベントが記録されている日数。
+        戻り値: ({ゲーム: (合計, 日数, 平均)}, 全ゲームの平均)
+        """
+        totals = self.daily_totals(table, country_names, games, day_range, column)
+        days = self.game_days(games, day_range)
+        per_game = {}
+        for game in sorted(days):
+            total = sum(n for (g, d), n in totals.items() if g == game and d != UNKNOWN_DAY)
+            per_game[game] = (total, len(days[game]), total / len(days[game]))
+        all_days = sum(v[1] for v in per_game.values())
+        overall = sum(v[0] for v in per_game.values()) / all_days if all_days else 0.0
+        return per_game, overall
+
+
+def country_names(country):
+    """ 英語・日本語のどちらで指定しても、アーカイブ内の両方の表記に当たるようにする """
+    from analyze_war_log import TRANSLATION_DICT
+    names = {country, TRANSLATION_DICT.get(country, country)}
+    names.update(en for en, jp in TRANSLATION_DICT.items() if jp == country)
+    return names
+
+
+def print_average(archive, table, country, games=None, day_range=None, column=None):
+    per_game, overall = archive.average_per_day(table, country_names(country), games, day_range, column)
+    label = {'losses': '損失', 'combats': '撃破' if column != 'victim' else '被撃破', 'occupations': '占領'}[table]
+    print(f"\n■ {country} の1日あたりの{label}数")
+    for game, (total, days, avg) in per_game.items():
+        print(f"　{game}: {avg:.1f} (合計 {total} / {days} 日)")
+    print(f"　全ゲーム: {overall:.1f}")
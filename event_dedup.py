@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+# =========================================================
+# イベントの重複排除
+# =========================================================
+# 新聞ページは何度も保存するので、同じ段落 (イベント) が複数のファイルに入っている。
+# 「日時 + 正規化した本文」のハッシュ (8バイト) でイベントを識別し、
+# 一度数えたイベントは二重に数えないようにする。
+#
+# ファイルごとのハッシュ集合と日時の範囲はインデックスとして保存しておき、
+# 次回以降は「中身が全て既出のファイル」を解析せずに丸ごと飛ばす。
+
+INDEX_FILE_NAME = ".event_index.json"
+
+_SPACES = re.compile(r'\s+')
+
+
+def event_key(date_str, text):
+    """ 日時 + 正規化した本文から 64bit のハッシュ値を作る """
+    normalized = _SPACES.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+    digest = hashlib.blake2b(f"{date_str}|{normalized}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _parse_sort_key(date_str):
+    match = re.search(r'(\d+)\s+(\d{2}):(\d{2}):(\d{2})', date_str)
+    if not match:
+        return None
+    d, h, m, s = map(int, match.groups())
+    return d * 86400 + h * 3600 + m * 60 + s
+
+
+def _pack(keys):
+    return base64.b64encode(b''.join(k.to_bytes(8, 'big') for k in sorted(keys))).decode('ascii')
+
+
+def _unpack(data):
+    raw = base64.b64decode(data)
+    return {int.from_bytes(raw[i:i + 8], 'big') for i in range(0, len(raw), 8)}
+
+
+class EventDeduplicator:
+    """
+    1回の解析 (1つの集計) で使う重複排除器。
+    seen は今回の解析で既に数えたイベント、index は過去の解析で作ったファイルごとの記録。
+    """
+
+    def __init__(self, index_path=None, autosave=True):
+        self.index_path = index_path
+        self.autosave = autosave  # False なら抽出器はインデックスを保存しない (呼び出し側でまとめて save する)
+        self.index = {}
+        self.seen = set()
+        self.covered_min = None
+        self.covered_max = None
+        self._current = None
+        self._index_dirty = False
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+
+    @classmethod
+    def for_dir(cls, target_dir, autosave=True):
+        return cls(os.path.join(target_dir, INDEX_FILE_NAME), autosave)
+
+    @classmethod
+    def for_files(cls, input_files):
+        """ 解析対象ファイルと同じフォルダにインデックスを置く """
+        if not input_files:
+            return cls()
+        return cls.for_dir(os.path.dirname(os.path.abspath(input_files[0])))
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return [st.st_mtime, st.st_size]
+
+    def order_files(self, input_files):
+        """ 大きいファイル (範囲が広いエクスポート) から処理すると、後の小さいファイルを飛ばしやすい """
+        return sorted(input_files, key=lambda p: (-os.path.getsize(p) if os.path.exists(p) else 0, p))
+
+    def _record(self, path):
+        rec = self.index.get(os.path.abspath(path))
+        if rec and os.path.exists(path) and rec['sig'] == self._signature(path):
+            return rec
+        return None
+
+    def should_skip_file(self, path):
+        """ 前回の記録があり、その全イベントが既に数えられていれば True """
+        rec = self._record(path)
+        if rec is None or self.covered_min is None:
+            return False
+        # まず日時の範囲で粗く判定し、範囲内ならハッシュ集合で厳密に判定する
+        if rec['min'] is not None and (rec['min'] < self.covered_min or rec['max'] > self.covered_max):
+            return False
+        return _unpack(rec['keys']) <= self.seen
+
+    def begin_file(self, path):
+        self._current = {'path': path, 'keys': set(), 'min': None, 'max': None}
+
+    def is_duplicate(self, date_str, text):
+        """ 既に数えたイベントなら True。初出なら記録して False """
+        key = event_key(date_str, text)
+        cur = self._current
+        if cur is not None:
+            cur['keys'].add(key)
+            sort_key = _parse_sort_key(date_str)
+            if sort_key is not None:
+                cur['min'] = sort_key if cur['min'] is None else min(cur['min'], sort_key)
+                cur['max'] = sort_key if cur['max'] is None else max(cur['max'], sort_key)
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        return False
+
+    def _cover(self, lo, hi):
+        if lo is None:
+            return
+        self.covered_min = lo if self.covered_min is None else min(self.covered_min, lo)
+        self.covered_max = hi if self.covered_max is None else max(self.covered_max, hi)
+
+    def end_file(self):
+        """ 1ファイルを最後まで処理したら、そのファイルの記録をインデックスに残す """
+        cur, self._current = self._current, None
+        if cur is None:
+            return
+        self._cover(cur['min'], cur['max'])
+        path = cur['path']
+        self.index[os.path.abspath(path)] = {
+            'sig': self._signature(path),
+            'min': cur['min'],
+            'max': cur['max'],
+            'keys': _pack(cur['keys']),
+        }
+        self._index_dirty = True
+
+    def discard_file(self, cover=True):
+        """
+        一部の記事を飛ばした (絞り込みあり) 解析では、ファイルの記録を残さない。
+        cover: 絞り込み条件に合う記事は全て見たなら True (サンプリングで記事を間引いたときは False)。
+        前回の記録があれば、その全イベントを既出として扱い、後のファイルを丸ごと飛ばせるようにする
+        (同じ段落は同じ条件で必ず同じように捨てられるので、絞り込みで見なかったイベントも数え漏れない)。
+        """
+        cur, self._current = self._current, None
+        if not cover or cur is None:
+            return
+        rec = self._record(cur['path'])
+        if rec is not None:
+            self.seen |= _unpack(rec['keys'])
+            self._cover(rec['min'], rec['max'])
+
+    def file_range(self, path):
+        """ 前回記録したファイルの日時の範囲 (sort_key の最小, 最大)。不明なら None """
+        rec = self._record(path)
+        if rec is None or rec['min'] is None:
+            return None
+        return rec['min'], rec['max']
+
+    def save(self, force=False):
+        """ force: 他の重複排除器とインデックスを共有しているときに、変更の有無を問わず書き出す """
+        if not self.index_path or not (self._index_dirty or force):
+            return
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_dirty = False
@@ -0,0 +1,120 @@
+import re
+
+import locale_patterns
+
+# =========================================================
+# 絞り込み条件 (フィルターの前倒し)
+# =========================================================
+# 国・イベント種別・ゲーム内日数の条件を受け取り、安い判定から順に当てる。
+#   1. ファイル    : 重複排除インデックスに記録された日時の範囲 (event_dedup.py)
+#   2. 記事        : BeautifulSoup にする前の生 HTML への部分文字列検索
+#   3. 段落        : event_time と func_country_link だけを見る (get_text や正規表現の前)
+#   4. イベント    : 翻訳 (translate) やレコード作成の前に国名を判定
+# 狭い条件の集計ほど、全件解析より大幅に速くなる。
+
+_RAW_EVENT_DAY = re.compile(r'event_time[^>]*>[^<]*?(\d+)\s+\d{2}:\d{2}:\d{2}')
+_DATE_DAY = re.compile(r'(\d+)\s+\d{2}:\d{2}:\d{2}')
+
+
+class EventFilter:
+    def __init__(self, countries=None, excluded=None, event_types=None, day_range=None, aliases=None):
+        """
+        countries   : 対象の国名 (英語・日本語どちらでも可。空なら全ての国)
+        excluded    : 除外する国名
+        event_types : 'combat' / 'loss' / 'occupy' のいずれか (空なら全て)
+        day_range   : (最初の日, 最後の日) ゲーム内日数。両端を含む
+        aliases     : 翻訳辞書 {英語: 日本語}。日本語で指定された国も生テキストで探せるようにする
+        """
+        self.countries = set(countries or [])
+        self.excluded = set(excluded or [])
+        self.event_types = set(event_types or [])
+        unknown = self.event_types - set(locale_patterns.EVENT_TYPES)
+        if unknown:
+            raise ValueError(f"未対応のイベント種別です: {sorted(unknown)}")
+        self.day_range = tuple(day_range) if day_range else None
+
+        # 生の HTML / リンク文字列と照合する名前 (翻訳前の英語名も含める)
+        self._raw_names = set(self.countries)
+        for en, jp in (aliases or {}).items():
+            if jp in self.countries:
+                self._raw_names.add(en)
+        # 言語が分かるまでは全言語の文言で判定する
+        self.use_locale(locale_patterns.get_pack(locale_patterns.MIXED))
+
+    @property
+    def prunes(self):
+        """ ファイル・記事・段落を丸ごと飛ばすことがあるか (除外リストだけなら飛ばさない) """
+        return bool(self.countries or self.event_types or self.day_range)
+
+    def use_locale(self, pack):
+        """ ファイルの言語 (locale_patterns.PatternPack) が分かったら、その言語の文言だけで判定する """
+        self._keywords = [k for t in sorted(self.event_types) for k in pack.keywords[t]]
+
+    def wants(self, event_type):
+        return not self.event_types or event_type in self.event_types
+
+    # -----------------------------------
+    # ゲーム内日数
+    # -----------------------------------
+    def day_ok(self, day):
+        if not self.day_range:
+            return True
+        return self.day_range[0] <= day <= self.day_range[1]
+
+    def date_ok(self, date_str):
+        """ event_time の文字列 ('Day 36 22:40:06' など) が範囲内か。日付が読めなければ通す """
+        if not self.day_range:
+            return True
+        match = _DATE_DAY.search(date_str)
+        return not match or self.day_ok(int(match.group(1)))
+
+    def file_may_match(self, path, dedup=None):
+        """ 前回の解析で記録した日時の範囲が条件と重ならないファイルは開かない """
+        if not self.day_range or dedup is None:
+            return True
+        rng = dedup.file_range(path)
+        if rng is None:
+            return True
+        lo, hi = rng[0] // 86400, rng[1] // 86400
+        return not (hi < self.day_range[0] or lo > self.day_range[1])
+
+    # -----------------------------------
+    # 記事・段落
+    # -----------------------------------
+    def article_may_match(self, raw_html):
+        """ 生 HTML の部分文字列だけで、明らかに対象外の記事を落とす """
+        if self._keywords and not any(k in raw_html for k in self._keywords):
+            return False
+        if self._raw_names and not any(name in raw_html for name in self._raw_names):
+            return False
+        if self.day_range:
+            days = _RAW_EVENT_DAY.findall(raw_html)
+            if days and not any(self.day_ok(int(d)) for d in days):
+                return False
+        return True
+
+    def links_may_match(self, p):
+        """ 段落の国リンクに対象国が1つも無ければ False (リンクが無い段落は判断できないので通す) """
+        if not self._raw_names:
+            return True
+        links = p.find_all(class_='func_country_link')
+        if not links:
+            return True
+        return any(link.get_text().strip() in self._raw_names for link in links)
+
+    def text_may_match(self, text):
+        if not self._keywords:
+            return True
+        return any(k in text for k in self._keywords)
+
+    # -----------------------------------
+    # 国名 (翻訳前に判定する)
+    # -----------------------------------
+    def is_excluded(self, *names):
+        return any(n in self.excluded for n in names)
+
+    def country_ok(self, *names):
+        """ 除外リストに無く、対象国の指定があればそれに含まれるか """
+        if self.is_excluded(*names):
+            return False
+        return not self.countries or any(n in self.countries for n in names)
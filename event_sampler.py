@@ -0,0 +1,112 @@
+import hashlib
+import math
+import random
+from collections import defaultdict
+
+# =========================================================
+# プレビュー用のサンプリング (概算)
+# =========================================================
+# 解析時間の大半は HTML の解析なので、記事単位でサンプリングし、選ばれなかった記事は
+# 区切りを探すだけで解析しない (newspaper_stream.iter_articles の keep)。
+#   - 記事を選ぶかどうかは記事の最初の段落のハッシュで決めるので、複数のファイルに入っている
+#     同じ記事は同じように選ばれる (重複排除と矛盾しない)。
+#   - 損失数は記事ごとの合計を 1/率 倍して推定し (Horvitz-Thompson 推定量)、
+#     記事のばらつきから 95% の誤差幅を付ける。
+#   - 地図は (国, 日) ごとにリザーバーサンプリングで点の数に上限を付ける。
+# 結果は全て「概算」と表示する。
+
+DEFAULT_RATE = 0.1
+Z_95 = 1.96
+MAP_POINTS_PER_STRATUM = 30
+
+
+class PreviewSampler:
+    def __init__(self, rate=DEFAULT_RATE):
+        if not 0 < rate <= 1:
+            raise ValueError(f"サンプリング率は 0 より大きく 1 以下にしてください: {rate}")
+        self.rate = rate
+        self.seen = 0
+        self.kept = 0
+        self.current = None  # 今解析している記事の番号 (レコードの 'Sample' に入れる)
+        self._threshold = int(rate * (1 << 64))
+
+    def keep_article(self, raw_segment):
+        """ newspaper_stream.iter_articles の keep に渡す """
+        self.seen += 1
+        end = raw_segment.find('</p>')
+        key = raw_segment[:end] if end >= 0 else raw_segment
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        if int.from_bytes(digest, 'big') < self._threshold:
+            self.kept += 1
+            self.current = self.kept
+            return True
+        return False
+
+    @property
+    def label(self):
+        return f"概算 (記事の {self.rate:.0%} をサンプル: {self.kept}/{self.seen} 件)"
+
+    @property
+    def label_en(self):
+        return f"APPROXIMATE preview: {self.rate:.0%} article sample ({self.kept}/{self.seen})"
+
+
+# -----------------------------------
+# 損失数の推定
+# -----------------------------------
+def estimate_casualties(casualties, rate):
+    """
+    サンプルの損失レコードから全体の損失数を推定する。
+    戻り値: {日: [(国, 兵種, 推定数, 誤差幅)], None: 総合計} (analyze_war_log.summarize_casualties と同じ並び)
+    """
+    per_row = defaultdict(lambda: defaultdict(int))  # (日, 国, 兵種) -> {記事: 数}
+    for rec in casualties:
+        for day in (rec['Day'], None):
+            per_row[(day, rec['Country'], rec['Unit'])][rec.get('Sample')] += rec['Count']
+
+    summary = defaultdict(list)
+    for (day, country, unit), by_article in per_row.items():
+        total = sum(by_article.values())
+        # ポアソンサンプリングの分散推定: (1 - p) / p^2 * Σ y^2
+        var = (1 - rate) / rate ** 2 * sum(y * y for y in by_article.values())
+        summary[day].append((country, unit, total / rate, Z_95 * math.sqrt(var)))
+    for rows in summary.values():
+        rows.sort(key=lambda r: (r[0], -r[2]))
+    summary.setdefault(None, [])
+    return dict(summary)
+
+
+def print_estimate(casualties, sampler, formats=None, out_dir='reports'):
+    """ analyze_war_log.print_report の概算版。formats を指定するとファイルにも書き出す """
+    import report_writer
+
+    estimate = estimate_casualties(casualties, sampler.rate)
+    report_writer.print_estimate_chat(estimate, sampler.label)
+    if formats:
+        for path in report_writer.write_estimate(formats, out_dir, estimate, sampler.label, sampler.rate):
+            print(f"保存しました: {path}")
+
+
+# -----------------------------------
+# 地図用: (国, 日) ごとのリザーバーサンプリング
+# -----------------------------------
+def reservoir_by_stratum(events, key, per_stratum=MAP_POINTS_PER_STRATUM, seed=0):
+    """ key(イベント) ごとに最大 per_stratum 件を等確率で残す。元の順番は保つ """
+    rng = random.Random(seed)
+    reservoirs, seen = {}, defaultdict(int)
+    for i, ev in enumerate(events):
+        stratum = key(ev)
+        seen[stratum] += 1
+        res = reservoirs.setdefault(stratum, [])
+        if len(res) < per_stratum:
+            res.append((i, ev))
+        else:
+            j = rng.randrange(seen[stratum])
+            if j < per_stratum:
+                res[j] = (i, ev)
+    kept = sorted(item for res in reservoirs.values() for item in res)
+    return [ev for _, ev in kept]
+
+
+def thin_map_events(map_events, per_stratum=MAP_POINTS_PER_STRATUM):
+    return reservoir_by_stratum(map_events, lambda ev: (ev['country'], ev['sort_key'] // 86400), per_stratum)
@@ -0,0 +1,97 @@
+import re
+from collections import defaultdict
+
+# =========================================================
+# 交換比マトリクス (攻撃国 × 攻撃兵種 × 被害国 × 被害兵種 → 撃破数)
+# =========================================================
+# 撃破イベントの抽出 (plot_battle_time.extract_combat_events) と同じ1回の走査で
+# 疎な辞書として数えておき、K/D 比や「誰が何で何を倒しているか」を
+# ファイルを読み直さずに引けるようにする。
+
+_ORDINAL_PREFIX = re.compile(r'^(?:the\s+)?\d+(?:st|nd|rd|th)\s+', re.IGNORECASE)
+
+
+def unit_type(unit_name):
+    """ '12th Main Battle Tank' -> 'Main Battle Tank' (部隊番号を除いた兵種名) """
+    name = _ORDINAL_PREFIX.sub('', unit_name.strip())
+    if name.lower().startswith('the '):
+        name = name[4:]
+    return name.strip() or "Unknown"
+
+
+class ExchangeMatrix:
+    def __init__(self):
+        # (攻撃国, 攻撃兵種, 被害国, 被害兵種) -> 数
+        self.counts = defaultdict(int)
+        # 参照用の索引 (国 -> キーの集合)
+        self._by_attacker = defaultdict(set)
+        self._by_victim = defaultdict(set)
+
+    def add(self, attacker_country, attacker_unit, victim_country, victim_unit, n=1):
+        key = (attacker_country, unit_type(attacker_unit), victim_country, unit_type(victim_unit))
+        self.counts[key] += n
+        self._by_attacker[attacker_country].add(key)
+        self._by_victim[victim_country].add(key)
+
+    @classmethod
+    def from_events(cls, combat_events):
+        """ extract_combat_events の結果から作る (サーバーなどで抽出済みの場合) """
+        matrix = cls()
+        for ev in combat_events:
+            matrix.add(ev['attacker'], ev.get('attacker_unit', ''), ev['victim'], ev.get('victim_unit', ''))
+        return matrix
+
+    def merge(self, other):
+        for (a, au, v, vu), n in other.counts.items():
+            self.add(a, au, v, vu, n)
+        return self
+
+    # -----------------------------------
+    # 参照
+    # -----------------------------------
+    def countries(self):
+        return sorted(set(self._by_attacker) | set(self._by_victim))
+
+    def kills(self, country):
+        return sum(self.counts[k] for k in self._by_attacker.get(country, ()))
+
+    def losses(self, country):
+        return sum(self.counts[k] for k in self._by_victim.get(country, ()))
+
+    def kd_ratio(self, country):
+        """ 撃破数 / 被撃破数 (被撃破が0なら撃破数をそのまま返す) """
+        kills, losses = self.kills(country), self.losses(country)
+        return kills / losses if losses else float(kills)
+
+    def kills_by(self, attacker_country):
+        """ 攻撃国が「どの兵種で」「どの国の何を」倒したか。数の多い順 """
+        rows = [(au, v, vu, self.counts[(a, au, v, vu)]) for a, au, v, vu in self._by_attacker.get(attacker_country, ())]
+        return sorted(rows, key=lambda r: r[3], reverse=True)
+
+    def losses_to(self, victim_country):
+        """ 被害国の「どの兵種が」「どの国の何に」倒されたか。数の多い順 """
+        rows = [(vu, a, au, self.counts[(a, au, v, vu)]) for a, au, v, vu in self._by_victim.get(victim_country, ())]
+        return sorted(rows, key=lambda r: r[3], reverse=True)
+
+    def between(self, attacker_country, victim_country):
+        """ 2国間の撃破数 """
+        return sum(self.counts[k] for k in self._by_attacker.get(attacker_country, ()) if k[2] == victim_country)
+
+
+def print_summary(matrix):
+    print("\n" + "=" * 40)
+    print("【K/D 比】 (撃破 / 被撃破)")
+    print("=" * 40)
+    rows = [(c, matrix.kills(c), matrix.losses(c), matrix.kd_ratio(c)) for c in matrix.countries()]
+    for country, kills, losses, kd in sorted(rows, key=lambda r: r[3], reverse=True):
+        print(f"■ {country}: {kills} / {losses} (K/D {kd:.2f})")
+
+
+def print_country(matrix, country, limit=15):
+    print(f"\n■ {country} 撃破 {matrix.kills(country)} / 被撃破 {matrix.losses(country)} (K/D {matrix.kd_ratio(country):.2f})")
+    print("【撃破 (自軍兵種 → 相手国 相手兵種)】")
+    for au, v, vu, n in matrix.kills_by(country)[:limit]:
+        print(f"　{au} → {v} {vu}: {n}")
+    print("【被撃破 (自軍兵種 ← 相手国 相手兵種)】")
+    for vu, a, au, n in matrix.losses_to(country)[:limit]:
+        print(f"　{vu} ← {a} {au}: {n}")
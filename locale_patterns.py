@@ -0,0 +1,124 @@
+import re
+
+from newspaper_stream import iter_article_html
+
+# =========================================================
+# クライアント言語ごとの文言パターン
+# =========================================================
+# 新聞の文言はゲームクライアントの言語で変わる (英語: "destroyed by" / 日本語: "により撃破されました")。
+# ファイルごとに最初の数件の記事から言語を1回だけ判定し、その言語のパターンだけを使う。
+# 新しい言語に対応するときは PATTERN_PACKS に1つ追加するだけでよい。
+#
+#   loss / combat / occupy : イベントの種類を見分ける文言 (部分文字列)
+#   destroyed_by           : 後ろに攻撃側の「部隊名 (国名)」が続く文言 (combat の一部)
+#   *_marker               : 正規表現に埋め込む文言 (正規表現の書式)
+#   regex                  : 語順が違う言語だけ、下の _TEMPLATES を上書きする
+
+PATTERN_PACKS = {
+    'en': {
+        'loss': ["lost"],
+        'combat': ["destroyed by"],
+        'destroyed_by': ["destroyed by"],
+        'occupy': ["occupied"],
+        'loss_marker': r'lost:?',
+        'occupy_marker': r'has occupied',
+    },
+    'ja': {
+        'loss': ["を失いました"],
+        'combat': ["により撃破されました", "壊滅しました"],
+        'destroyed_by': ["により撃破されました"],
+        'occupy': ["を占領しました"],
+        'loss_marker': r'を失いました',
+        'occupy_marker': r'を占領しました',
+    },
+}
+
+_TEMPLATES = {
+    # 損失: "lost: 4 Main Battle Tank" -> (数, 兵種...)
+    'loss': r'(?:{loss_marker})\s*(\d+)\s*(.+)',
+    # 撃破: "destroyed by the 2th Motorized Infantry (Egypt)" -> (攻撃部隊, 攻撃国)
+    'attacker': r'(?:{destroyed_by}) (?:the )?(.+?) \(([^)]+)\)',
+    # 占領: "The 22th Strike Fighter (Sudan) has occupied" -> (部隊, 国)
+    'occupy': r'(?:^|\s)(.+?) \(([^)]+)\) (?:{occupy_marker})',
+    # 部隊番号: "The 12th Main Battle Tank (Iraq)" -> (番号, 接尾辞, 兵種, 国)
+    'unit': r'(?:The\s+|by\s+the\s+)?(\d+)(st|nd|rd|th)\s+([^(]+?)\s+\(([^)]+)\)',
+}
+
+EVENT_TYPES = ('loss', 'combat', 'occupy')
+DETECT_SAMPLE_ARTICLES = 5
+MIXED = 'mixed'
+
+
+class PatternPack:
+    """ 1言語分の文言と、コンパイル済みの正規表現 """
+
+    def __init__(self, code, spec):
+        self.code = code
+        self.keywords = {t: list(spec.get(t, [])) for t in EVENT_TYPES}
+        self.destroyed_by = list(spec.get('destroyed_by', []))
+        fields = {
+            'loss_marker': spec.get('loss_marker', ''),
+            'occupy_marker': spec.get('occupy_marker', ''),
+            'destroyed_by': '|'.join(re.escape(k) for k in self.destroyed_by),
+        }
+        overrides = spec.get('regex', {})
+        self.regex = {name: re.compile(overrides.get(name) or tmpl.format(**fields))
+                      for name, tmpl in _TEMPLATES.items()}
+
+    def has(self, event_type, text):
+        return any(k in text for k in self.keywords[event_type])
+
+    def split_destroyed(self, text):
+        """ 「被害側」と「攻撃側」に分ける。文言が無ければ None """
+        for k in self.destroyed_by:
+            if k in text:
+                return text.split(k)
+        return None
+
+    def all_keywords(self):
+        return [k for words in self.keywords.values() for k in words]
+
+
+def _mixed_spec():
+    """ 全言語を足し合わせたパック (言語が判定できないファイル用) """
+    spec = {'loss': [], 'combat': [], 'destroyed_by': [], 'occupy': []}
+    loss_markers, occupy_markers = [], []
+    for pack in PATTERN_PACKS.values():
+        for key in spec:
+            spec[key] += pack.get(key, [])
+        loss_markers.append(pack['loss_marker'])
+        occupy_markers.append(pack['occupy_marker'])
+    spec['loss_marker'] = '|'.join(loss_markers)
+    spec['occupy_marker'] = '|'.join(occupy_markers)
+    return spec
+
+
+_PACKS = {code: PatternPack(code, spec) for code, spec in PATTERN_PACKS.items()}
+_PACKS[MIXED] = PatternPack(MIXED, _mixed_spec())
+
+
+def get_pack(code):
+    return _PACKS[code]
+
+
+def detect_locale(raw_articles):
+    """
+    記事の生 HTML から言語を判定する。
+    文言が見つかった言語が1つだけならその言語、複数または見つからなければ MIXED。
+    """
+    hits = {code: 0 for code in PATTERN_PACKS}
+    for html in raw_articles:
+        for code in PATTERN_PACKS:
+            hits[code] += sum(html.count(k) for k in _PACKS[code].all_keywords())
+    found = [code for code, n in hits.items() if n]
+    return found[0] if len(found) == 1 else MIXED
+
+
+def pack_for_file(file_path, sample=DETECT_SAMPLE_ARTICLES):
+    """ ファイルの最初の sample 件の記事から言語を判定し、そのパックを返す """
+    articles = []
+    for html in iter_article_html(file_path):
+        articles.append(html)
+        if len(articles) >= sample:
+            break
+    return _PACKS[detect_locale(articles)]
@@ -0,0 +1,153 @@
+import re
+from collections import deque
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+# =========================================================
+# 新聞エクスポートのストリーミング解析
+# =========================================================
+# ファイル全体を read() して BeautifulSoup の木を作ると、巨大なエクスポートでは
+# メモリを大量に使う。ここではファイルを少しずつ読み、newspaper_article の div
+# 1つ分の HTML が揃った時点でその記事だけを BeautifulSoup にして渡す。
+# 呼び出し側が記事を使い終われば捨てられるので、メモリ使用量はファイルの大きさに依存しない。
+
+CHUNK_SIZE = 64 * 1024
+ARTICLE_CLASS = 'newspaper_article'
+
+# 記事の開始タグ (サンプリング時に HTMLParser を通さずに記事の区切りだけを探す)
+_ARTICLE_START = re.compile(r'<div\b[^>]*\bclass\s*=\s*["\'](?:[^"\']*\s)?' + ARTICLE_CLASS + r'(?:\s[^"\']*)?["\']', re.IGNORECASE)
+# チャンクの境目で開始タグが切れても見落とさないように残す長さ
+_TAIL_KEEP = 512
+
+
+class _ArticleCollector(HTMLParser):
+    """ newspaper_article の div の中身だけを生の HTML として集める """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.completed = deque()
+        self._buf = None
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        raw = self.get_starttag_text()
+        if self._buf is None:
+            if tag == 'div' and ARTICLE_CLASS in (dict(attrs).get('class') or '').split():
+                self._buf = [raw]
+                self._depth = 1
+            return
+        self._buf.append(raw)
+        if tag == 'div':
+            self._depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self._buf is not None:
+            self._buf.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self._buf is None:
+            return
+        self._buf.append(f"</{tag}>")
+        if tag == 'div':
+            self._depth -= 1
+            if self._depth == 0:
+                self.completed.append(''.join(self._buf))
+                self._buf = None
+
+    def handle_data(self, data):
+        if self._buf is not None:
+            self._buf.append(data)
+
+    def handle_entityref(self, name):
+        if self._buf is not None:
+            self._buf.append(f"&{name};")
+
+    def handle_charref(self, name):
+        if self._buf is not None:
+            self._buf.append(f"&#{name};")
+
+    def flush(self):
+        """ 閉じられないまま終わった記事 (壊れたHTML) も最後に渡す """
+        if self._buf:
+            self.completed.append(''.join(self._buf))
+        self._buf = None
+
+
+def iter_article_html(file_path, chunk_size=CHUNK_SIZE):
+    """ 記事1件分の生 HTML 文字列を順番に返す """
+    parser = _ArticleCollector()
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            while parser.completed:
+                yield parser.completed.popleft()
+    parser.close()
+    parser.flush()
+    while parser.completed:
+        yield parser.completed.popleft()
+
+
+def iter_article_segments(file_path, chunk_size=CHUNK_SIZE):
+    """
+    記事の開始タグから次の記事の開始タグの直前までの生テキストを順番に返す。
+    正規表現で区切りを探すだけなので、HTMLParser で全体を解析するより大幅に速い。
+    """
+    buf = ""
+    scan_from = 0
+    open_start = False  # buf の先頭が記事の開始タグか
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            # 前回までに調べた部分は探し直さない (巨大な記事でも全体で線形時間)
+            starts = [m.start() for m in _ARTICLE_START.finditer(buf, scan_from) if m.start() > 0 or not open_start]
+            if open_start:
+                starts.insert(0, 0)
+            if not chunk:
+                if starts:
+                    yield buf[starts[0]:]
+                return
+            if not starts:
+                buf = buf[-_TAIL_KEEP:]
+                scan_from = 0
+                continue
+            for begin, end in zip(starts, starts[1:]):
+                yield buf[begin:end]
+            buf = buf[starts[-1]:]
+            open_start = True
+            scan_from = max(1, len(buf) - _TAIL_KEEP)
+
+
+def iter_sampled_article_html(file_path, keep, chunk_size=CHUNK_SIZE):
+    """ keep(生テキスト) が True の記事だけを HTMLParser で切り出して返す (プレビュー用のサンプリング) """
+    for segment in iter_article_segments(file_path, chunk_size):
+        if not keep(segment):
+            continue
+        parser = _ArticleCollector()
+        parser.feed(segment)
+        parser.close()
+        parser.flush()
+        if parser.completed:
+            yield parser.completed.popleft()
+
+
+def iter_articles(file_path, chunk_size=CHUNK_SIZE, raw_filter=None, keep=None):
+    """
+    newspaper_article の div (BeautifulSoup の Tag) を1件ずつ返す。
+    raw_filter (生 HTML -> bool) が False を返した記事は BeautifulSoup にせずに捨てる。
+    keep を渡すと、記事の区切りだけを探して keep が True の記事以外は解析しない (サンプリング)。
+    """
+    if keep is not None:
+        htmls = iter_sampled_article_html(file_path, keep, chunk_size)
+    else:
+        htmls = iter_article_html(file_path, chunk_size)
+    for html in htmls:
+        if raw_filter is not None and not raw_filter(html):
+            continue
+        article = BeautifulSoup(html, 'html.parser').find('div', class_=ARTICLE_CLASS)
+        if article is not None:
+            yield article
@@ -1,12 +1,14 @@
 import bs4
-from bs4 import BeautifulSoup
 import re
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import numpy as np
 from datetime import datetime, timedelta
 import os
 import glob
+from event_dedup import EventDeduplicator
+from newspaper_stream import iter_articles
+from event_filter import EventFilter
+import locale_patterns
+from exchange_matrix import unit_type
+# matplotlib / numpy は描画時だけ import する (起動を軽くするため)
 
 # =========================================================
 # [ユーザー設定エリア]
@@ -57,94 +59,143 @@ def get_real_time_from_game_time(game_day_str, game_time_str, ref_real_dt, ref_g
     diff_real_seconds = diff_game_seconds / speed
     return ref_real_dt + timedelta(seconds=diff_real_seconds)
 
-def load_data():
-    files_path = os.path.join(TARGET_DIR, FILE_PATTERN)
-    input_files = glob.glob(files_path)
-    
-    if not input_files:
-        print(f"エラー: '{TARGET_DIR}' にファイルが見つかりません。")
-        return []
+def get_files(target_dir=TARGET_DIR):
+    files_path = os.path.join(target_dir, FILE_PATTERN)
+    return glob.glob(files_path)
 
-    try:
-        ref_real_dt = datetime.strptime(REFERENCE_REAL_TIME_STR, "%Y-%m-%d %H:%M:%S")
-        ref_game_total_sec = parse_game_total_seconds(str(REFERENCE_GAME_DAY), REFERENCE_GAME_TIME_STR)
-    except Exception as e:
-        print(f"設定エラー: {e}")
-        return []
-
-    combat_times = []
-    regex_attacker = re.compile(r'(?:destroyed by|により撃破されました) .+? \((.+?)\)')
+def extract_combat_events(input_files, dedup=None, matrix=None, event_filter=None, sampler=None):
+    """
+    撃破イベントを全攻撃国ぶん抽出する。重複ファイル中の同じイベントは1回だけ数える。
+    戻り値: [{'attacker': 国, 'attacker_unit': 兵種, 'victim': 国, 'victim_unit': 兵種,
+              'game_day': '36', 'game_time': 'HH:MM:SS'}, ...]
+    matrix (exchange_matrix.ExchangeMatrix) を渡すと、同じ走査で交換比マトリクスにも数える。
+    event_filter (event_filter.EventFilter) の国の条件は攻撃国に対して判定する。
+    sampler (event_sampler.PreviewSampler) を渡すと一部の記事だけを解析する (概算のプレビュー用)。
+    """
+    combat_events = []
+    if dedup is None:
+        dedup = EventDeduplicator.for_files(input_files)
+    if event_filter is None:
+        event_filter = EventFilter()
+    # 被害側: 「部隊名 (国名)」の組を前から順に拾う
+    regex_victim = re.compile(r'([^()]*?)\s*\(([^)]+)\)')
 
-    for file_path in input_files:
+    for file_path in dedup.order_files(input_files):
+        if dedup.should_skip_file(file_path):
+            print(f"スキップ (解析済み): {file_path}")
+            continue
+        if not event_filter.file_may_match(file_path, dedup):
+            print(f"スキップ (日数の範囲外): {file_path}")
+            continue
         print(f"解析中: {file_path}")
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                soup = BeautifulSoup(f, 'html.parser')
-        except: continue
-
-        articles = soup.find_all('div', class_='newspaper_article')
-        for article in articles:
+        # ファイル全体を読み込まず、記事を1件ずつ取り出して解析する
+        dedup.begin_file(file_path)
+        # クライアントの言語を判定し、その言語のパターンだけを使う
+        pack = locale_patterns.pack_for_file(file_path)
+        event_filter.use_locale(pack)
+        keep = sampler.keep_article if sampler else None
+        for article in iter_articles(file_path, raw_filter=event_filter.article_may_match, keep=keep):
             body = article.find('div', class_='newspaper_body')
             if not body: continue
             
             for p in body.find_all('p'):
+                date_span = p.find('span', class_='event_time')
+                date_str = date_span.get_text().strip() if date_span else "Unknown"
+                if not event_filter.date_ok(date_str) or not event_filter.links_may_match(p): continue
                 text = p.get_text().strip()
-                if "destroyed by" in text or "により撃破されました" in text:
-                    # 攻撃国チェック
-                    attacker_match = regex_attacker.search(text)
+                if dedup.is_duplicate(date_str, text): continue
+
+                parts = pack.split_destroyed(text)
+                if parts:
+                    # 攻撃国
+                    attacker_match = pack.regex['attacker'].search(text)
                     if not attacker_match: continue
-                    if attacker_match.group(1).strip() != TARGET_ATTACKER_COUNTRY: continue
+                    if not event_filter.country_ok(attacker_match.group(2).strip()): continue
 
                     # 被害国チェック (Undead除外)
-                    if "destroyed by" in text: parts = text.split("destroyed by")
-                    else: parts = text.split("により撃破されました")
-                    
-                    victim_part = parts[0]
-                    brackets = re.findall(r'\((.+?)\)', victim_part)
+                    victim_part = parts[0].replace(date_str, '', 1)
+                    brackets = regex_victim.findall(victim_part)
                     victim_country = "Unknown"
-                    if len(brackets) >= 2: victim_country = brackets[-2].strip()
-                    elif len(brackets) == 1: victim_country = brackets[0].strip()
+                    victim_unit = "Unknown"
+                    if len(brackets) >= 2: victim_unit, victim_country = brackets[-2]
+                    elif len(brackets) == 1: victim_unit, victim_country = brackets[0]
+                    victim_country = victim_country.strip()
                     
                     if victim_country in EXCLUDED_VICTIM_COUNTRIES: continue
 
                     # 時間抽出
-                    date_span = p.find('span', class_='event_time')
                     if date_span:
-                        date_str = date_span.get_text().strip()
                         time_match = re.search(r'(\d+)\s+(\d{2}):(\d{2}):(\d{2})', date_str)
                         if time_match:
                             g_day, g_h, g_m, g_s = time_match.group(1), time_match.group(2), time_match.group(3), time_match.group(4)
-                            g_time_str = f"{g_h}:{g_m}:{g_s}"
-                            real_dt = get_real_time_from_game_time(g_day, g_time_str, ref_real_dt, ref_game_total_sec, GAME_SPEED)
-                            if real_dt: combat_times.append(real_dt)
-    
+                            ev = {
+                                'attacker': attacker_match.group(2).strip(),
+                                'attacker_unit': unit_type(attacker_match.group(1)),
+                                'victim': victim_country,
+                                'victim_unit': unit_type(victim_unit),
+                                'game_day': g_day,
+                                'game_time': f"{g_h}:{g_m}:{g_s}",
+                            }
+                            combat_events.append(ev)
+                            if matrix is not None:
+                                matrix.add(ev['attacker'], ev['attacker_unit'], ev['victim'], ev['victim_unit'])
+        if event_filter.prunes or sampler:
+            dedup.discard_file(cover=not sampler)
+        else:
+            dedup.end_file()
+
+    if dedup.autosave:
+        dedup.save()
+    return combat_events
+
+def to_real_times(combat_events, attacker_country=TARGET_ATTACKER_COUNTRY, game_speed=GAME_SPEED,
+                  ref_real_time_str=REFERENCE_REAL_TIME_STR, ref_game_day=REFERENCE_GAME_DAY,
+                  ref_game_time_str=REFERENCE_GAME_TIME_STR):
+    """ 指定した攻撃国のイベントを現実時刻に変換し、時系列順のリストで返す """
+    try:
+        ref_real_dt = datetime.strptime(ref_real_time_str, "%Y-%m-%d %H:%M:%S")
+        ref_game_total_sec = parse_game_total_seconds(str(ref_game_day), ref_game_time_str)
+    except Exception as e:
+        print(f"設定エラー: {e}")
+        return []
+
+    combat_times = []
+    for ev in combat_events:
+        if ev['attacker'] != attacker_country: continue
+        real_dt = get_real_time_from_game_time(ev['game_day'], ev['game_time'], ref_real_dt, ref_game_total_sec, game_speed)
+        if real_dt: combat_times.append(real_dt)
+
     # 時系列順にソートしておく
     combat_times.sort()
     return combat_times
 
-def analyze_and_plot(combat_times):
-    if not combat_times:
-        print("データが見つかりませんでした。")
-        return
+def load_data(target_dir=TARGET_DIR, attacker_country=TARGET_ATTACKER_COUNTRY, game_speed=GAME_SPEED,
+              ref_real_time_str=REFERENCE_REAL_TIME_STR, ref_game_day=REFERENCE_GAME_DAY,
+              ref_game_time_str=REFERENCE_GAME_TIME_STR, day_range=None, sampler=None):
+    input_files = get_files(target_dir)
+    
+    if not input_files:
+        print(f"エラー: '{target_dir}' にファイルが見つかりません。")
+        return []
 
-    # 時間を 0.0 ~ 24.0 の数値に変換
-    hours = np.array([t.hour + t.minute/60.0 + t.second/3600.0 for t in combat_times])
-    n = len(hours)
+    # 1カ国だけ見るので、他国の撃破しか載っていない記事は解析しない
+    event_filter = EventFilter([attacker_country], event_types=['combat'], day_range=day_range)
+    combat_events = extract_combat_events(input_files, event_filter=event_filter, sampler=sampler)
+    return to_real_times(combat_events, attacker_country, game_speed,
+                         ref_real_time_str, ref_game_day, ref_game_time_str)
 
-    print("\n" + "="*40)
-    print("【アクティブ時間帯 時系列フロー解析】")
-    print("="*40)
-    print(f"サンプル数 : {n}")
-    print(f"期間       : {combat_times[0].strftime('%Y-%m-%d %H:%M')} ~ {combat_times[-1].strftime('%Y-%m-%d %H:%M')}")
-    print("-" * 40)
+def draw_activity(ax1, ax2, combat_times, attacker_country, compact=False):
+    """ 散布図 (ax1) + 背景ヒストグラム (ax2, ax1 の twinx) を描く。対話表示とバッチ出力で共用 """
+    import matplotlib.dates as mdates
+    import numpy as np
 
-    # グラフ描画設定
-    fig, ax1 = plt.subplots(figsize=(10, 8))
+    # 時間を 0.0 ~ 24.0 の数値に変換
+    hours = np.array([t.hour + t.minute/60.0 + t.second/3600.0 for t in combat_times])
 
     # --- 1. 背景ヒストグラム (右軸: 頻度) ---
-    ax2 = ax1.twinx()
     ax2.hist(hours, bins=24, range=(0, 24), color='gray', alpha=0.15, edgecolor='none', label='Total Frequency')
-    ax2.set_ylabel('Event Frequency (Histogram)', color='gray')
+    if not compact:
+        ax2.set_ylabel('Event Frequency (Histogram)', color='gray')
     ax2.tick_params(axis='y', labelcolor='gray')
     # ヒストグラムの上限を少し余裕持たせて、散布図の邪魔にならないようにする
     ax2.set_ylim(0, ax2.get_ylim()[1] * 1.2)
@@ -153,7 +204,7 @@ def analyze_and_plot(combat_times):
     # Y軸を日付にするため、plot_dateやscatterを使うが、単純なscatterだと数値扱いになるので注意が必要
     # matplotlibでは日付を内部的にfloatで扱っているため、そのまま渡してyaxis_date()でフォーマットする
     
-    ax1.scatter(hours, combat_times, color='red', s=50, alpha=0.8, edgecolors='black', label='Combat Event')
+    ax1.scatter(hours, combat_times, color='red', s=15 if compact else 50, alpha=0.8, edgecolors='black', label='Combat Event')
     
     # Y軸を日付フォーマットに設定
     ax1.yaxis_date()
@@ -164,21 +215,122 @@ def analyze_and_plot(combat_times):
     # 反転前: 下が古い(小)、上が新しい(大) -> invert -> 上が古い、下が新しい
     ax1.invert_yaxis()
     
-    ax1.set_xlabel('Hour of Day (Real Time)')
-    ax1.set_ylabel('Date (Older -> Newer)')
-    ax1.set_title(f'Timeline of Combat Activities: {TARGET_ATTACKER_COUNTRY}')
+    if compact:
+        ax1.set_title(f'{attacker_country} ({len(combat_times)})', fontsize=9)
+    else:
+        ax1.set_xlabel('Hour of Day (Real Time)')
+        ax1.set_ylabel('Date (Older -> Newer)')
+        ax1.set_title(f'Timeline of Combat Activities: {attacker_country}')
     
     # X軸の設定 (0時~24時)
     ax1.set_xlim(0, 24)
-    ax1.set_xticks(np.arange(0, 25, 1))
+    ax1.set_xticks(np.arange(0, 25, 6 if compact else 1))
     ax1.grid(True, axis='x', linestyle='--', alpha=0.6)
     
     # グリッド (Y軸の日付グリッドも見やすくする)
     ax1.grid(True, axis='y', linestyle='-', alpha=0.3)
 
+def analyze_and_plot(combat_times, attacker_country=TARGET_ATTACKER_COUNTRY, note=None):
+    import matplotlib.pyplot as plt
+
+    if not combat_times:
+        print("データが見つかりませんでした。")
+        return
+
+    print("\n" + "="*40)
+    print("【アクティブ時間帯 時系列フロー解析】")
+    print("="*40)
+    if note:
+        print(note)
+    print(f"サンプル数 : {len(combat_times)}")
+    print(f"期間       : {combat_times[0].strftime('%Y-%m-%d %H:%M')} ~ {combat_times[-1].strftime('%Y-%m-%d %H:%M')}")
+    print("-" * 40)
+
+    # グラフ描画設定
+    fig, ax1 = plt.subplots(figsize=(10, 8))
+    ax2 = ax1.twinx()
+    draw_activity(ax1, ax2, combat_times, attacker_country)
+    if note:
+        # 概算 (サンプリング) の結果であることをグラフ上にも表示する
+        fig.suptitle(note, color='red', fontsize=11)
+
     plt.tight_layout()
     plt.show()
 
+# ---------------------------------------------------------
+# バッチ出力 (全攻撃国のグラフを画面表示なしでファイルに保存)
+# ---------------------------------------------------------
+# ワーカープロセスごとに Figure と軸を1回だけ作り、国ごとに中身を消して描き直す
+_worker_fig = None
+_worker_axes = None
+
+def _init_render_worker():
+    global _worker_fig, _worker_axes
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    _worker_fig, ax1 = plt.subplots(figsize=(10, 8))
+    _worker_axes = (ax1, ax1.twinx())
+
+def _render_one(attacker_country, combat_times, out_path, note=None):
+    ax1, ax2 = _worker_axes
+    ax1.cla()
+    ax2.cla()
+    # cla() で twinx の右軸設定が外れるので戻す
+    ax2.yaxis.tick_right()
+    ax2.yaxis.set_label_position('right')
+    draw_activity(ax1, ax2, combat_times, attacker_country)
+    if note:
+        _worker_fig.suptitle(note, color='red', fontsize=11)
+    _worker_fig.tight_layout()
+    _worker_fig.savefig(out_path)
+    return out_path
+
+def _safe_file_name(name):
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name)
+
+def group_by_attacker(combat_events, **time_kwargs):
+    """ {攻撃国: 時系列順の現実時刻リスト} を返す """
+    attackers = sorted({ev['attacker'] for ev in combat_events})
+    return {c: to_real_times(combat_events, c, **time_kwargs) for c in attackers}
+
+def render_all(times_by_country, out_dir, fmt='png', workers=None, min_events=1, note=None):
+    """ 国ごとのグラフをプロセスプールで並列に描画し、保存したパスのリストを返す """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(c, times, os.path.join(out_dir, f"activity_{_safe_file_name(c)}.{fmt}"), note)
+            for c, times in times_by_country.items() if len(times) >= min_events]
+    if not jobs:
+        return []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as pool:
+        futures = [pool.submit(_render_one, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+def render_grid(times_by_country, out_path, cols=4, min_events=1, note=None):
+    """ 全攻撃国を1枚の小さなグラフの並び (small multiples) にまとめて保存する """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    items = [(c, t) for c, t in sorted(times_by_country.items(), key=lambda x: len(x[1]), reverse=True)
+             if len(t) >= min_events]
+    if not items:
+        return None
+    rows = (len(items) + cols - 1) // cols
+    fig, axes = plt.subplots(rows, cols, figsize=(4 * cols, 3.2 * rows), squeeze=False)
+    for ax1, (country, times) in zip(axes.flat, items):
+        draw_activity(ax1, ax1.twinx(), times, country, compact=True)
+    for ax1 in list(axes.flat)[len(items):]:
+        ax1.set_visible(False)
+    if note:
+        fig.suptitle(note, color='red', fontsize=12)
+    fig.tight_layout()
+    fig.savefig(out_path)
+    plt.close(fig)
+    return out_path
+
 if __name__ == "__main__":
     data = load_data()
     analyze_and_plot(data)
\ No newline at end of file
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+# =========================================================
+# 州名のあいまい検索 (ローカルの地名辞書 + 文字トライグラム索引)
+# =========================================================
+# data-prov-name はゲーム独自の綴り・接尾辞 ("... Province")・日本語名などのせいで
+# geocode() に失敗しやすく、失敗のたびに 1.1 秒の待ち時間を使ってしまう。
+# ここでは地名辞書 (gazetteer) の名前を正規化して文字トライグラムの索引を作っておき、
+#   1. 正規化した名前の完全一致
+#   2. トライグラムを共有する候補を Dice 係数で順位付けし、MIN_SCORE 以上で
+#      方角などの修飾語 (East / West / 北 / 南 ...) が一致すれば採用
+# の順にローカルで解決する。どうしても解決できない名前だけをネットワークに問い合わせる。
+# あいまい一致の結果は確定した座標ではないので geocode_cache.json には保存せず、毎回解決し直す。
+#
+# 地名辞書に使えるもの:
+#   - geocode_cache.json   ネットワークで取得できた座標 (自動で追加される)
+#   - gazetteer.json       {名前: [緯度, 経度]} (手で追加する別名など)
+#   - GeoNames の cities*.txt (タブ区切り。別名の列に日本語名も含まれる)
+
+GEOCODE_CACHE_FILE = "geocode_cache.json"
+GAZETTEER_FILES = ["gazetteer.json", "gazetteer.txt"]
+MIN_SCORE = 0.7
+RESOLVE_CANDIDATES = 10  # 修飾語が合わない候補を飛ばすときに見る上位の件数
+
+# 州名によく付く接尾辞 (正規化のときに外す)
+_SUFFIXES = re.compile(
+    r'\s+(?:province|governorate|oblast|region|district|county|prefecture|state|territory|city|muhafazat)$'
+    r'|(?:州|県|省|地方|地区|市)$')
+_NON_WORD = re.compile(r'[^\w]+')
+
+# 方角などの修飾語。違うと別の州 (East Darfur と West Darfur) なので、あいまい一致でも一致を必須にする
+_QUALIFIERS = {
+    'north': ('north',), 'northern': ('north',), 'south': ('south',), 'southern': ('south',),
+    'east': ('east',), 'eastern': ('east',), 'west': ('west',), 'western': ('west',),
+    'northeast': ('north', 'east'), 'northwest': ('north', 'west'),
+    'southeast': ('south', 'east'), 'southwest': ('south', 'west'),
+    'central': ('central',), 'centre': ('central',), 'center': ('central',),
+    'upper': ('upper',), 'lower': ('lower',), 'new': ('new',), 'old': ('old',),
+    'greater': ('greater',), 'inner': ('inner',), 'outer': ('outer',),
+}
+_JA_DIRECTIONS = {'北': 'north', '南': 'south', '東': 'east', '西': 'west'}
+# 日本語は「西ダルフール」のように、カタカナの地名の前に付いた方角だけを修飾語とみなす (北京などは対象外)
+_JA_QUALIFIER = re.compile(r'^(中央|[東西南北]{1,2})(?=[\u30a0-\u30ff])')
+
+
+def _strip_latin_accents(text):
+    """ ラテン文字のアクセント記号だけを外す (かなの濁点・半濁点は残す: バグダッド ≠ ハクタット) """
+    out, base = [], ''
+    for ch in unicodedata.normalize('NFKD', text):
+        if unicodedata.combining(ch):
+            if 'LATIN' in unicodedata.name(base, ''):
+                continue
+        else:
+            base = ch
+        out.append(ch)
+    return unicodedata.normalize('NFKC', ''.join(out))
+
+
+def normalize(name):
+    """ 大文字小文字・アクセント記号・記号・接尾辞の違いを吸収する """
+    text = _strip_latin_accents(name).lower().strip()
+    text = _SUFFIXES.sub('', text)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def qualifiers(normalized):
+    """ 正規化した名前に含まれる修飾語の集合 """
+    found = set()
+    for token in normalized.split():
+        found.update(_QUALIFIERS.get(token, ()))
+    match = _JA_QUALIFIER.match(normalized)
+    if match:
+        prefix = match.group(1)
+        found.update(['central'] if prefix == '中央' else (_JA_DIRECTIONS[ch] for ch in prefix))
+    return found
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProvinceResolver:
+    def __init__(self, min_score=MIN_SCORE):
+        self.min_score = min_score
+        self.names = []        # 元の名前
+        self.coords = []       # (緯度, 経度)
+        self._grams = []       # 名前ごとのトライグラム集合
+        self._exact = {}       # 正規化した名前 -> id
+        self._index = defaultdict(list)  # トライグラム -> [id]
+
+    def add(self, name, coords):
+        key = normalize(name)
+        if not key or key in self._exact:
+            return
+        i = len(self.names)
+        grams = trigrams(key)
+        self.names.append(name)
+        self.coords.append(tuple(coords))
+        self._grams.append(grams)
+        self._exact[key] = i
+        for g in grams:
+            self._index[g].append(i)
+
+    # -----------------------------------
+    # 地名辞書の読み込み
+    # -----------------------------------
+    def load_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for name, coords in json.load(f).items():
+                if coords:
+                    self.add(name, coords)
+
+    def load_geonames(self, path):
+        """ GeoNames (cities15000.txt など): 1列目 id, 2列目 名前, 4列目 別名 (カンマ区切り), 5・6列目 緯度・経度 """
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                cols = line.rstrip('\n').split('\t')
+                if len(cols) < 6:
+                    continue
+                try:
+                    coords = (float(cols[4]), float(cols[5]))
+                except ValueError:
+                    continue
+                for name in [cols[1], cols[2]] + cols[3].split(','):
+                    if name:
+                        self.add(name, coords)
+
+    def load(self, path):
+        if path.endswith('.json'):
+            self.load_json(path)
+        else:
+            self.load_geonames(path)
+
+    # -----------------------------------
+    # 検索
+    # -----------------------------------
+    def suggest(self, name, limit=5):
+        """ 似ている順に [(名前, 座標, スコア)] """
+        key = normalize(name)
+        if not key:
+            return []
+        if key in self._exact:
+            i = self._exact[key]
+            return [(self.names[i], self.coords[i], 1.0)]
+
+        grams = trigrams(key)
+        shared = defaultdict(int)
+        for g in grams:
+            for i in self._index.get(g, ()):
+                shared[i] += 1
+        scored = [(2 * n / (len(grams) + len(self._grams[i])), i) for i, n in shared.items()]
+        scored.sort(key=lambda x: (-x[0], self.names[x[1]]))
+        return [(self.names[i], self.coords[i], score) for score, i in scored[:limit]]
+
+    def resolve(self, name):
+        """ MIN_SCORE 以上で、修飾語も一致した最上位の (名前, 座標, スコア)。見つからなければ None """
+        wanted = qualifiers(normalize(name))
+        for candidate in self.suggest(name, RESOLVE_CANDIDATES):
+            if candidate[2] < self.min_score:
+                break
+            if qualifiers(normalize(candidate[0])) == wanted:
+                return candidate
+        return None
+
+
+class GeocodeCache:
+    """
+    州名 -> 座標 の保存用キャッシュ。
+    {名前: {'coords': [緯度, 経度] または None, 'source': 'network' / 'gazetteer', 'match': ..., 'score': ...}}
+    coords が None の項目はネットワークでも見つからなかった名前 (二度と問い合わせない)。
+    あいまい一致 ('fuzzy') は保存しない。以前の版で保存したものは読み込み時に捨てる。
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        fuzzy = [name for name, e in self.entries.items() if e.get('source') == 'fuzzy']
+        for name in fuzzy:
+            del self.entries[name]
+        self._dirty = bool(fuzzy)
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def put(self, name, coords, source, match=None, score=None):
+        entry = {'coords': list(coords) if coords else None, 'source': source}
+        if match is not None:
+            entry['match'] = match
+            entry['score'] = round(score, 3)
+        self.entries[name] = entry
+        self._dirty = True
+
+    def located(self):
+        """ ネットワークで実際に見つかった名前と座標 (地名辞書として使う) """
+        return {name: e['coords'] for name, e in self.entries.items() if e['coords'] and e['source'] == 'network'}
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+def build_resolver(cache, gazetteer_files=GAZETTEER_FILES, min_score=MIN_SCORE):
+    """ キャッシュ済みの座標と、存在する地名辞書ファイルから索引を作る """
+    resolver = ProvinceResolver(min_score)
+    for name, coords in cache.located().items():
+        resolver.add(name, coords)
+    for path in gazetteer_files:
+        if os.path.exists(path):
+            resolver.load(path)
+    return resolver
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs, urlencode
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+import analyze_war_log
+import estimate_enemy_unit
+import plot_battle_time
+from event_dedup import EventDeduplicator
+from exchange_matrix import ExchangeMatrix
+from territory_timeline import TerritoryTimeline
+
+# =========================================================
+# 常駐クエリサーバー
+# =========================================================
+# ゲーム中に「N日目の損失」「X国の部隊」「Y国の活動時間帯」を何度も聞くたびに
+# 全ファイルを解析し直すのは無駄なので、一度解析した結果をメモリに保持しておき
+# ローカルの HTTP (127.0.0.1) で答える。新しいファイルは定期的に差分だけ読み込む。
+#
+#   python con_cli.py serve --dir data_zombi
+#   python con_cli.py query report --day 36
+#   python con_cli.py query units --country Sudan
+#   python con_cli.py query activity --country Sudan
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+REFRESH_INTERVAL = 30  # 秒
+
+
+_CLOCK = re.compile(r'^(\d{1,2}):(\d{2}):(\d{2})$')
+
+
+def _parse_day(day, name='day'):
+    """ ゲーム内の日数 (0 以上の整数)。不正なら ValueError (HTTP 400) """
+    try:
+        value = int(day)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer: {day!r}") from None
+    if value < 0:
+        raise ValueError(f"{name} must not be negative: {day!r}")
+    return value
+
+
+def _parse_clock(time_str, name='time'):
+    """ HH:MM:SS を秒にする。不正なら ValueError (HTTP 400) """
+    match = _CLOCK.match(time_str)
+    if not match:
+        raise ValueError(f"{name} must be HH:MM:SS: {time_str!r}")
+    h, m, s = map(int, match.groups())
+    if h > 23 or m > 59 or s > 59:
+        raise ValueError(f"{name} out of range: {time_str!r}")
+    return h * 3600 + m * 60 + s
+
+
+def _parse_real_time(real_str):
+    """ 基準点の現実日時 (YYYY-MM-DD HH:MM:SS)。不正なら ValueError (HTTP 400) """
+    try:
+        datetime.strptime(real_str, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ValueError(f"ref_real must be YYYY-MM-DD HH:MM:SS: {real_str!r}") from None
+    return real_str
+
+
+def _activity_params(params):
+    """ activity の speed / ref_real / ref_day / ref_time を検証して query_activity の引数にする """
+    kwargs = {'speed': _param_float(params, 'speed', plot_battle_time.GAME_SPEED)}
+    if 'ref_real' in params:
+        kwargs['ref_real'] = _parse_real_time(params['ref_real'])
+    if 'ref_day' in params:
+        kwargs['ref_day'] = _parse_day(params['ref_day'], 'ref_day')
+    if 'ref_time' in params:
+        _parse_clock(params['ref_time'], 'ref_time')
+        kwargs['ref_time'] = params['ref_time']
+    return kwargs
+
+
+class EventStore:
+    """ ファイルごとの解析結果と、それらをまとめた集計を保持する """
+
+    def __init__(self, target_dir):
+        self.target_dir = target_dir
+        self.files = {}  # path -> {'sig': (mtime, size), 'casualties': [...], ...}
+        self._reset_dedup()
+        self.casualty_summary = {}
+        self.unit_records = []
+        self.combat_events = []
+        self.exchange = ExchangeMatrix()
+        self.territory = TerritoryTimeline()
+        self.last_refresh = None
+
+    def _reset_dedup(self):
+        # 抽出器ごとに「既に数えたイベント」を持ち越し、新しいファイルとの重複を除く。
+        # インデックスは1つのファイルなので3つで共有し、ファイルごとに1回だけ保存する
+        self.dedup = {name: EventDeduplicator.for_dir(self.target_dir, autosave=False)
+                      for name in ('events', 'units', 'combat')}
+        for dedup in self.dedup.values():
+            dedup.index = self.dedup['events'].index
+
+    def _signature(self, path):
+        st = os.stat(path)
+        return (st.st_mtime, st.st_size)
+
+    def _parse_file(self, path):
+        casualties, map_events = analyze_war_log.extract_events([path], self.dedup['events'])
+        data = {
+            'sig': self._signature(path),
+            'casualties': casualties,
+            'map_events': map_events,
+            'units': estimate_enemy_unit.extract_units([path], [], self.dedup['units']),
+            'combat': plot_battle_time.extract_combat_events([path], self.dedup['combat']),
+        }
+        self.dedup['events'].save(force=True)
+        return data
+
+    def refresh(self):
+        """ 新規ファイルだけを解析する。変更があれば True を返す """
+        current = set(analyze_war_log.get_files(self.target_dir))
+
+        # 既存ファイルが消えた・書き換わった場合は、重複排除の状態ごと作り直す
+        stale = [path for path, data in self.files.items()
+                 if path not in current or not os.path.exists(path) or data['sig'] != self._signature(path)]
+        if stale:
+            self.files = {}
+            self._reset_dedup()
+            self.territory = TerritoryTimeline()
+
+        new_files = [path for path in current if path not in self.files]
+        for path in self.dedup['events'].order_files(new_files):
+            try:
+                self.files[path] = self._parse_file(path)
+            except OSError:
+                continue
+            # 支配図は作り直さず、新しいファイルの占領イベントだけを足す
+            self.territory.add_events(self.files[path]['map_events'])
+        changed = bool(stale or new_files)
+
+        if changed:
+            self._rebuild()
+        self.last_refresh = time.time()
+        return changed
+
+    def _rebuild(self):
+        casualties, self.unit_records, self.combat_events = [], [], []
+        for data in self.files.values():
+            casualties.extend(data['casualties'])
+            self.unit_records.extend(data['units'])
+            self.combat_events.extend(data['combat'])
+        self.casualty_summary = analyze_war_log.summarize_casualties(casualties)
+        self.exchange = ExchangeMatrix.from_events(self.combat_events)
+
+    # -----------------------------------
+    # クエリ
+    # -----------------------------------
+    def query_report(self, day=None):
+        if day is None:
+            rows = self.casualty_summary.get(None, [])
+        else:
+            rows = next((v for k, v in self.casualty_summary.items()
+                         if k is not None and k.split()[-1] == str(day)), [])
+        return {'day': day, 'rows': [{'Country': c, 'Unit': u, 'Count': n} for c, u, n in rows]}
+
+    def query_units(self, country=None):
+        by_country = estimate_enemy_unit.latest_sightings(self.unit_records)
+        if country:
+            names = {country, estimate_enemy_unit.translate(country)}
+            by_country = {c: v for c, v in by_country.items() if c in names}
+        return {c: [{'UnitNumber': r['UnitNumber'], 'UnitName': r['UnitName'], 'LastSeen': r['LastSeen']}
+                    for r in recs] for c, recs in by_country.items()}
+
+    def query_activity(self, country, speed=plot_battle_time.GAME_SPEED,
+                       ref_real=plot_battle_time.REFERENCE_REAL_TIME_STR,
+                       ref_day=plot_battle_time.REFERENCE_GAME_DAY,
+                       ref_time=plot_battle_time.REFERENCE_GAME_TIME_STR):
+        """ 基準点 (現実日時 / ゲーム内日数 / ゲーム内時刻) は con_cli.py activity / cube と同じ意味 """
+        combat_times = plot_battle_time.to_real_times(self.combat_events, country, speed, ref_real, ref_day, ref_time)
+        hours = [0] * 24
+        for t in combat_times:
+            hours[t.hour] += 1
+        return {'country': country, 'samples': len(combat_times), 'hours': hours}
+
+    def query_exchange(self, country=None):
+        if not country:
+            return {c: {'kills': self.exchange.kills(c), 'losses': self.exchange.losses(c),
+                        'kd': self.exchange.kd_ratio(c)} for c in self.exchange.countries()}
+        return {
+            'country': country, 'kills': self.exchange.kills(country), 'losses': self.exchange.losses(country),
+            'kd': self.exchange.kd_ratio(country),
+            'kills_by': [{'unit': au, 'victim': v, 'victim_unit': vu, 'count': n}
+                         for au, v, vu, n in self.exchange.kills_by(country)],
+            'losses_to': [{'unit': vu, 'attacker': a, 'attacker_unit': au, 'count': n}
+                          for vu, a, au, n in self.exchange.losses_to(country)],
+        }
+
+    def query_territory(self, day=None, time_str=None):
+        """ 時刻の支配図 (省略時は最新)。day だけなら、その日の終わりの時点 """
+        if day is None:
+            state = self.territory.state
+        else:
+            state = self.territory.state_at(_parse_day(day) * 86400 + _parse_clock(time_str or "23:59:59"))
+        return {'day': day, 'time': time_str, 'owners': state}
+
+    def query_changes(self, day):
+        """ その日に支配者が変わった州 """
+        changes = self.territory.changes_on_day(_parse_day(day))
+        return {'day': day, 'changes': [{'province': p, 'from': old, 'to': new, 'times': n}
+                                        for p, (old, new, n) in sorted(changes.items())]}
+
+    def status(self):
+        return {'files': len(self.files), 'combat_events': len(self.combat_events),
+                'unit_records': len(self.unit_records), 'territory_changes': len(self.territory.deltas),
+                'last_refresh': self.last_refresh}
+
+
+# -----------------------------------
+# HTTP (GET のみの最小実装)
+# -----------------------------------
+def _param_float(params, name, default):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number: {value!r}") from None
+
+
+async def _handle(store, lock, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass  # ヘッダーは読み捨てる
+        if len(request_line) < 2:
+            return
+
+        url = urlsplit(request_line[1])
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        endpoint = url.path.strip('/')
+
+        status = "200 OK"
+        loop = asyncio.get_running_loop()
+        async with lock:
+            try:
+                if endpoint == 'report':
+                    body = store.query_report(params.get('day'))
+                elif endpoint == 'units':
+                    body = store.query_units(params.get('country'))
+                elif endpoint == 'activity' and 'country' in params:
+                    body = store.query_activity(params['country'], **_activity_params(params))
+                elif endpoint == 'exchange':
+                    body = store.query_exchange(params.get('country'))
+                elif endpoint == 'territory':
+                    body = store.query_territory(params.get('day'), params.get('time'))
+                elif endpoint == 'changes' and 'day' in params:
+                    body = store.query_changes(params['day'])
+                elif endpoint == 'refresh':
+                    await loop.run_in_executor(None, store.refresh)
+                    body = store.status()
+                elif endpoint == 'status':
+                    body = store.status()
+                else:
+                    status, body = "404 Not Found", {'error': f"unknown query: {url.path}"}
+            except ValueError as e:
+                # パラメーターの形式が不正
+                status, body = "400 Bad Request", {'error': str(e)}
+            except Exception as e:
+                # 応答を返さずに接続を切らないよう、想定外のエラーも JSON で返す
+                status, body = "500 Internal Server Error", {'error': f"{type(e).__name__}: {e}"}
+
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+        writer.write(payload)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _refresh_loop(store, lock, interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        async with lock:
+            if await loop.run_in_executor(None, store.refresh):
+                print(f"更新: {store.status()}")
+
+
+async def serve(target_dir, host=DEFAULT_HOST, port=DEFAULT_PORT, interval=REFRESH_INTERVAL):
+    store = EventStore(target_dir)
+    lock = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, store.refresh)
+    print(f"読み込み完了: {store.status()}")
+
+    server = await asyncio.start_server(lambda r, w: _handle(store, lock, r, w), host, port)
+    print(f"待ち受け中: http://{host}:{port}/ (report / units / activity / exchange / territory / changes / refresh / status)")
+    refresher = asyncio.create_task(_refresh_loop(store, lock, interval))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        refresher.cancel()
+
+
+def run_server(target_dir, host=DEFAULT_HOST, port=DEFAULT_PORT, interval=REFRESH_INTERVAL):
+    try:
+        asyncio.run(serve(target_dir, host, port, interval))
+    except KeyboardInterrupt:
+        print("終了します。")
+
+
+class QueryError(Exception):
+    """ サーバーがエラー (400 / 404 / 500) を返した、または接続できなかった """
+
+
+def query(endpoint, host=DEFAULT_HOST, port=DEFAULT_PORT, **params):
+    """ サーバーに問い合わせて結果 (dict) を返す。エラーは QueryError (サーバーのエラーメッセージ付き) """
+    params = {k: v for k, v in params.items() if v is not None}
+    url = f"http://{host}:{port}/{endpoint}"
+    if params:
+        url += "?" + urlencode(params)
+    try:
+        with urlopen(url, timeout=60) as res:
+            return json.loads(res.read().decode('utf-8'))
+    except HTTPError as e:
+        try:
+            message = json.loads(e.read().decode('utf-8')).get('error') or e.reason
+        except ValueError:
+            message = e.reason
+        raise QueryError(f"{e.code} {message}") from None
+    except URLError as e:
+        raise QueryError(f"サーバーに接続できません ({host}:{port}): {e.reason}") from None
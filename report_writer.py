@@ -0,0 +1,275 @@
+import csv
+import json
+import os
+import sys
+
+# =========================================================
+# レポート出力 (チャット用テキスト / Markdown / CSV / JSON)
+# =========================================================
+# 集計 (analyze_war_log.summarize_casualties, estimate_enemy_unit.latest_sightings) は1回だけ行い、
+# 同じ集計結果を各形式に書き出す。行はジェネレーターで作って大きなバッファ付きで
+# まとめて書き込むので、数千行あっても出力のコストはほとんどかからない。
+
+FORMATS = ('text', 'md', 'csv', 'json')
+BUFFER_SIZE = 1 << 16
+
+_EXTENSIONS = {'text': 'txt', 'md': 'md', 'json': 'json'}
+
+
+def _day_sort_key(day):
+    last = day.split()[-1] if day else ''
+    return (0, int(last), day) if last.isdigit() else (1, 0, day)
+
+
+def _days(casualty_summary):
+    return sorted((d for d in casualty_summary if d is not None), key=_day_sort_key)
+
+
+# -----------------------------------
+# チャット用テキスト (LINE などにそのまま貼れるリスト形式)
+# -----------------------------------
+def _chat_rows(rows):
+    current_country = None
+    for country, unit, count in rows:
+        # 国名が変わったら見出しを表示 (2カ国目以降は上に空行)
+        if country != current_country:
+            prefix = "\n" if current_country is not None else ""
+            yield f"{prefix}■ {country}"
+            current_country = country
+        # インデントに全角スペースを使うと、日本語環境では比較的揃って見えやすい
+        yield f"　{unit}: {count}"
+
+
+def casualty_chat_lines(casualty_summary):
+    yield "\n" + "=" * 30
+    yield "【死亡数集計レポート】"
+    yield "=" * 30
+    if not casualty_summary:
+        yield "損失データなし"
+        return
+    for day in _days(casualty_summary):
+        yield f"\n>>> 日付: {day}"
+        yield from _chat_rows(casualty_summary[day])
+    yield "\n" + "-" * 30
+    yield "【総合計】"
+    yield from _chat_rows(casualty_summary[None])
+
+
+def unit_chat_lines(unit_summary):
+    yield "\n" + "=" * 50
+    yield "【部隊番号による戦力推定リスト (修正版)】"
+    yield "確認された部隊番号を大きい順に列挙します。"
+    yield "=" * 50
+    for country in sorted(unit_summary):
+        units = unit_summary[country]
+        yield f"\n■ {country} (確認数: {len(units)}, 最大番号: {units[0]['UnitNumber']})"
+        yield f"{'番号':<6} | {'現在の部隊名 (推定)':<25} | {'最終確認日時'}"
+        yield "-" * 60
+        for row in units:
+            yield f"#{row['UnitNumber']:<5} | {row['UnitName']:<32} | {row['LastSeen']}"
+
+
+# -----------------------------------
+# Markdown
+# -----------------------------------
+def _md_escape(value):
+    return str(value).replace('|', '\\|')
+
+
+def casualty_md_lines(casualty_summary):
+    yield "# 死亡数集計レポート"
+    if not casualty_summary:
+        yield "\n損失データなし"
+        return
+    for title, key in [(f"日付: {d}", d) for d in _days(casualty_summary)] + [("総合計", None)]:
+        yield f"\n## {title}\n"
+        yield "| 国 | 兵種 | 数 |"
+        yield "| --- | --- | ---: |"
+        for country, unit, count in casualty_summary[key]:
+            yield f"| {_md_escape(country)} | {_md_escape(unit)} | {count} |"
+
+
+def unit_md_lines(unit_summary):
+    yield "\n# 部隊番号による戦力推定リスト"
+    for country in sorted(unit_summary):
+        units = unit_summary[country]
+        yield f"\n## {_md_escape(country)} (確認数: {len(units)}, 最大番号: {units[0]['UnitNumber']})\n"
+        yield "| 番号 | 現在の部隊名 (推定) | 最終確認日時 |"
+        yield "| ---: | --- | --- |"
+        for row in units:
+            yield f"| {row['UnitNumber']} | {_md_escape(row['UnitName'])} | {_md_escape(row['LastSeen'])} |"
+
+
+# -----------------------------------
+# CSV / JSON
+# -----------------------------------
+def casualty_csv_rows(casualty_summary):
+    yield ['Day', 'Country', 'Unit', 'Count']
+    for day in _days(casualty_summary):
+        for country, unit, count in casualty_summary[day]:
+            yield [day, country, unit, count]
+    for country, unit, count in casualty_summary.get(None, []):
+        yield ['ALL', country, unit, count]
+
+
+def unit_csv_rows(unit_summary):
+    yield ['Country', 'UnitNumber', 'UnitName', 'LastSeen']
+    for country in sorted(unit_summary):
+        for row in unit_summary[country]:
+            yield [country, row['UnitNumber'], row['UnitName'], row['LastSeen']]
+
+
+def to_json_obj(casualty_summary=None, unit_summary=None):
+    obj = {}
+    if casualty_summary is not None:
+        def rows(key):
+            return [{'Country': c, 'Unit': u, 'Count': n} for c, u, n in casualty_summary.get(key, [])]
+        obj['casualties'] = {
+            'days': {day: rows(day) for day in _days(casualty_summary)},
+            'total': rows(None),
+        }
+    if unit_summary is not None:
+        obj['units'] = {
+            country: [{'UnitNumber': r['UnitNumber'], 'UnitName': r['UnitName'], 'LastSeen': r['LastSeen']}
+                      for r in unit_summary[country]]
+            for country in sorted(unit_summary)
+        }
+    return obj
+
+
+# -----------------------------------
+# 概算レポート (event_sampler.estimate_casualties の結果: {日: [(国, 兵種, 推定数, 誤差幅)]})
+# -----------------------------------
+def _estimate_chat_rows(rows):
+    current_country = None
+    for country, unit, est, err in rows:
+        if country != current_country:
+            prefix = "\n" if current_country is not None else ""
+            yield f"{prefix}■ {country}"
+            current_country = country
+        yield f"　{unit}: 約 {est:.0f} (±{err:.0f})"
+
+
+def estimate_chat_lines(estimate, label):
+    yield "\n" + "=" * 30
+    yield "【死亡数集計レポート (概算)】"
+    yield label
+    yield "推定数 (±95% の誤差幅)"
+    yield "=" * 30
+    for day in _days(estimate):
+        yield f"\n>>> 日付: {day}"
+        yield from _estimate_chat_rows(estimate[day])
+    yield "\n" + "-" * 30
+    yield "【総合計】"
+    yield from _estimate_chat_rows(estimate.get(None, []))
+
+
+def estimate_md_lines(estimate, label):
+    yield "# 死亡数集計レポート (概算)"
+    yield f"\n> {label}。推定数と ±95% の誤差幅"
+    for title, key in [(f"日付: {d}", d) for d in _days(estimate)] + [("総合計", None)]:
+        yield f"\n## {title}\n"
+        yield "| 国 | 兵種 | 推定数 | 誤差幅 (±95%) |"
+        yield "| --- | --- | ---: | ---: |"
+        for country, unit, est, err in estimate.get(key, []):
+            yield f"| {_md_escape(country)} | {_md_escape(unit)} | {est:.0f} | {err:.0f} |"
+
+
+def estimate_csv_rows(estimate):
+    yield ['Day', 'Country', 'Unit', 'Estimate', 'Error95']
+    for day in _days(estimate):
+        for country, unit, est, err in estimate[day]:
+            yield [day, country, unit, round(est, 1), round(err, 1)]
+    for country, unit, est, err in estimate.get(None, []):
+        yield ['ALL', country, unit, round(est, 1), round(err, 1)]
+
+
+def estimate_json_obj(estimate, label, rate):
+    def rows(key):
+        return [{'Country': c, 'Unit': u, 'Estimate': round(e, 1), 'Error95': round(r, 1)}
+                for c, u, e, r in estimate.get(key, [])]
+    return {'approximate': True, 'label': label, 'rate': rate,
+            'casualties': {'days': {day: rows(day) for day in _days(estimate)}, 'total': rows(None)}}
+
+
+# -----------------------------------
+# 書き出し
+# -----------------------------------
+def _open(path):
+    return open(path, 'w', encoding='utf-8', newline='', buffering=BUFFER_SIZE)
+
+
+def _write_lines(f, *line_iters):
+    for lines in line_iters:
+        f.writelines(line + "\n" for line in lines)
+
+
+def print_chat(casualty_summary=None, unit_summary=None, out=None):
+    """ チャット用テキストを標準出力 (または out) に書く """
+    out = out or sys.stdout
+    if casualty_summary is not None:
+        _write_lines(out, casualty_chat_lines(casualty_summary))
+    if unit_summary is not None:
+        _write_lines(out, unit_chat_lines(unit_summary))
+
+
+def print_estimate_chat(estimate, label, out=None):
+    """ 概算レポートのチャット用テキストを標準出力 (または out) に書く """
+    _write_lines(out or sys.stdout, estimate_chat_lines(estimate, label))
+
+
+def write_reports(formats, out_dir, casualty_summary=None, unit_summary=None, basename='report'):
+    """ 指定した形式すべてでファイルに書き出し、作成したパスのリストを返す """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"未対応の形式です: {fmt} ({', '.join(FORMATS)})")
+
+        if fmt == 'csv':
+            # CSV は列が違うので、両方ある場合は損失と部隊を別ファイルにする
+            both = casualty_summary is not None and unit_summary is not None
+            for name, summary, rows in [('casualties', casualty_summary, casualty_csv_rows),
+                                        ('units', unit_summary, unit_csv_rows)]:
+                if summary is None:
+                    continue
+                path = os.path.join(out_dir, f"{basename}_{name}.csv" if both else f"{basename}.csv")
+                with _open(path) as f:
+                    csv.writer(f).writerows(rows(summary))
+                paths.append(path)
+            continue
+
+        path = os.path.join(out_dir, f"{basename}.{_EXTENSIONS[fmt]}")
+        with _open(path) as f:
+            if fmt == 'text':
+                print_chat(casualty_summary, unit_summary, f)
+            elif fmt == 'md':
+                if casualty_summary is not None:
+                    _write_lines(f, casualty_md_lines(casualty_summary))
+                if unit_summary is not None:
+                    _write_lines(f, unit_md_lines(unit_summary))
+            elif fmt == 'json':
+                json.dump(to_json_obj(casualty_summary, unit_summary), f, ensure_ascii=False, indent=1)
+        paths.append(path)
+    return paths
+
+
+def write_estimate(formats, out_dir, estimate, label, rate, basename='casualties_preview'):
+    """ 概算レポートを指定した形式でファイルに書き出し、作成したパスのリストを返す """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"未対応の形式です: {fmt} ({', '.join(FORMATS)})")
+        path = os.path.join(out_dir, f"{basename}.{_EXTENSIONS.get(fmt, fmt)}")
+        with _open(path) as f:
+            if fmt == 'text':
+                _write_lines(f, estimate_chat_lines(estimate, label))
+            elif fmt == 'md':
+                _write_lines(f, estimate_md_lines(estimate, label))
+            elif fmt == 'csv':
+                csv.writer(f).writerows(estimate_csv_rows(estimate))
+            elif fmt == 'json':
+                json.dump(estimate_json_obj(estimate, label, rate), f, ensure_ascii=False, indent=1)
+        paths.append(path)
+    return paths
@@ -0,0 +1,167 @@
+import math
+from bisect import bisect_left, bisect_right
+
+# =========================================================
+# 位置と時刻で引ける目撃情報の索引
+# =========================================================
+# 座標の分かった撃破・占領イベント (analyze_war_log の地図イベント) を、
+# ゲーム内日数 (sort_key // 86400) ごとのパーティションに分け、その中を
+# 緯度経度の格子 (CELL_DEG 度四方) に振り分けておく。
+#   - 半径検索 : 円にかかる格子だけを見る
+#   - k 近傍   : 中心の格子から外側へ1周ずつ広げ、それより外に近い点が無いと分かった時点で止める
+# どちらも時間の範囲に入る日のパーティションしか見ないので、数千件でも数ミリ秒で答えられる。
+# 経度 ±180 度をまたぐ場合は考えない (ゲームの地図で日付変更線付近を扱うことはほぼ無いため)。
+
+CELL_DEG = 1.0
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SightingIndex:
+    def __init__(self, cell_deg=CELL_DEG):
+        self.cell_deg = cell_deg
+        self.partitions = {}   # 日 -> {(格子の行, 列): [(緯度, 経度, sort_key, イベント)]}
+        self._bounds = {}      # 日 -> [最小の行, 最大の行, 最小の列, 最大の列] (点のある格子の範囲)
+        self._days = []        # パーティションの日 (昇順)
+        self._max_abs_lat = 0.0
+        self.count = 0
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def add(self, coords, event):
+        lat, lon = coords
+        day = event['sort_key'] // 86400
+        row, col = self._cell(lat, lon)
+        if day not in self.partitions:
+            self.partitions[day] = {}
+            self._bounds[day] = [row, row, col, col]
+            self._days.insert(bisect_left(self._days, day), day)
+        else:
+            b = self._bounds[day]
+            b[0], b[1], b[2], b[3] = min(b[0], row), max(b[1], row), min(b[2], col), max(b[3], col)
+        self.partitions[day].setdefault((row, col), []).append((lat, lon, event['sort_key'], event))
+        self._max_abs_lat = max(self._max_abs_lat, abs(lat))
+        self.count += 1
+
+    @classmethod
+    def from_events(cls, map_events, locate, cell_deg=CELL_DEG):
+        """ locate(州名) -> (緯度, 経度) または None (analyze_war_log.get_lat_lon) """
+        index = cls(cell_deg)
+        for ev in map_events:
+            if ev.get('type') not in ('combat', 'occupy') or not ev.get('sort_key'):
+                continue
+            coords = locate(ev['location'])
+            if coords:
+                index.add(coords, ev)
+        return index
+
+    def latest_time(self):
+        if not self._days:
+            return None
+        return max(p[2] for cell in self.partitions[self._days[-1]].values() for p in cell)
+
+    # -----------------------------------
+    # 検索
+    # -----------------------------------
+    def _active_days(self, since, until):
+        """ 時間の範囲にかかる日 """
+        lo = bisect_left(self._days, since // 86400) if since is not None else 0
+        hi = bisect_right(self._days, until // 86400) if until is not None else len(self._days)
+        return self._days[lo:hi]
+
+    def _active(self, since, until):
+        """ 時間の範囲にかかる日のパーティション """
+        return [self.partitions[d] for d in self._active_days(since, until)]
+
+    def _points(self, partitions, cells, since, until, keep):
+        for part in partitions:
+            for cell in cells:
+                for lat, lon, t, ev in part.get(cell, ()):
+                    if (since is None or t >= since) and (until is None or t <= until) and keep(ev):
+                        yield lat, lon, ev
+
+    def radius(self, lat, lon, km, since=None, until=None, keep=lambda ev: True):
+        """ 中心から km 以内のイベントを [(距離km, イベント)] (近い順) で返す """
+        d_lat = km / KM_PER_DEG
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + d_lat))), 1e-6)
+        d_lon = min(180.0, d_lat / cos_lat)
+        (r0, c0), (r1, c1) = self._cell(lat - d_lat, lon - d_lon), self._cell(lat + d_lat, lon + d_lon)
+        cells = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+        found = []
+        for plat, plon, ev in self._points(self._active(since, until), cells, since, until, keep):
+            dist = haversine_km(lat, lon, plat, plon)
+            if dist <= km:
+                found.append((dist, ev))
+        found.sort(key=lambda x: (x[0], -x[1]['sort_key']))
+        return found
+
+    def nearest(self, lat, lon, k, since=None, until=None, keep=lambda ev: True):
+        """ 中心に近い k 件を [(距離km, イベント)] (近い順) で返す """
+        days = self._active_days(since, until)
+        if not days or k <= 0:
+            return []
+        partitions = [self.partitions[d] for d in days]
+        # 1周外側の格子にある点までの距離の下限 (経度方向は最も高緯度で縮む分を見込む)
+        cos_min = max(math.cos(math.radians(min(89.0, max(self._max_abs_lat, abs(lat))))), 1e-6)
+        step_km = self.cell_deg * KM_PER_DEG * cos_min
+
+        r0, c0 = self._cell(lat, lon)
+        # 対象のパーティションで点のある格子を全て含むところまで広げれば、それ以上は見る必要がない
+        # (時間の範囲に入る点が k 件に満たないときに地球全体まで広げ続けないため)
+        max_ring = max(max(abs(r0 - b[0]), abs(r0 - b[1]), abs(c0 - b[2]), abs(c0 - b[3]))
+                       for b in (self._bounds[d] for d in days))
+        found = []
+        for ring in range(max_ring + 1):
+            if ring == 0:
+                cells = [(r0, c0)]
+            else:
+                cells = [(r0 + dr, c0 + dc) for dr in range(-ring, ring + 1) for dc in range(-ring, ring + 1)
+                         if max(abs(dr), abs(dc)) == ring]
+            for plat, plon, ev in self._points(partitions, cells, since, until, keep):
+                found.append((haversine_km(lat, lon, plat, plon), ev))
+            if len(found) >= k:
+                found.sort(key=lambda x: (x[0], -x[1]['sort_key']))
+                found = found[:k]
+                # ring+1 周目以降の点は少なくとも ring * step_km 離れている
+                if found[-1][0] <= ring * step_km:
+                    break
+            if ring * step_km > math.pi * EARTH_RADIUS_KM:
+                break
+        found.sort(key=lambda x: (x[0], -x[1]['sort_key']))
+        return found[:k]
+
+
+def build_index(target_dir, cell_deg=CELL_DEG):
+    """ フォルダの撃破・占領イベントを解析し、座標を引いて索引を作る """
+    import analyze_war_log
+    event_filter = analyze_war_log.make_filter(event_types=['combat', 'occupy'])
+    _, map_events = analyze_war_log.extract_events(analyze_war_log.get_files(target_dir), event_filter=event_filter)
+    index = SightingIndex.from_events(map_events, analyze_war_log.get_lat_lon, cell_deg)
+    analyze_war_log._local_geo()[0].save()
+    return index
+
+
+def latest_by_unit(results):
+    """ 同じ部隊 (国, 部隊名) は最新の目撃だけを残す。[(距離km, イベント)] を新しい順で返す """
+    latest = {}
+    for dist, ev in results:
+        key = (ev['country'], ev['unit_name'])
+        if key not in latest or ev['sort_key'] > latest[key][1]['sort_key']:
+            latest[key] = (dist, ev)
+    return sorted(latest.values(), key=lambda x: -x[1]['sort_key'])
+
+
+def print_sightings(results, title):
+    print(f"\n【{title}】 {len(results)} 件")
+    for dist, ev in results:
+        kind = '撃破' if ev['type'] == 'combat' else '占領'
+        print(f"　{dist:7.1f} km | {ev['date_display']} | {ev['country']} {ev['unit_name']} | {kind} @ {ev['location']}")
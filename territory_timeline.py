@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right
+
+# =========================================================
+# 州 (data-prov-name) の支配者タイムライン
+# =========================================================
+# 占領イベント (analyze_war_log.extract_events の type == 'occupy') を時刻順に適用し、
+#   - 支配者が変わったときだけ差分ログ (時刻, 州, 前の支配者, 新しい支配者) に追加
+#   - ゲーム内 N 時間ごとに、その時点の支配状態をスナップショットとして保存
+# する。「時刻 T の支配図」は T 以前で最も近いスナップショット + その後の差分だけで作るので、
+# 戦争全体を最初から再生しなくてよい。
+#
+# 新しいファイルのイベントは add_events で足していく。既に適用した時刻より前のイベントが
+# 来た場合は、その直前のスナップショットまで戻ってそこから先だけを適用し直す。
+#
+# 時刻はゲーム内の通算秒 (sort_key = 日 * 86400 + 時 * 3600 + 分 * 60 + 秒)。
+
+DEFAULT_SNAPSHOT_HOURS = 6
+
+
+class TerritoryTimeline:
+    def __init__(self, snapshot_hours=DEFAULT_SNAPSHOT_HOURS):
+        self.interval = int(snapshot_hours * 3600)
+        self.state = {}            # 州 -> 現在の支配者
+        self.deltas = []           # [(時刻, 州, 前の支配者, 新しい支配者)] 時刻順
+        self._delta_times = []
+        self.snapshots = []        # [(時刻, {州: 支配者})] 時刻順。最初は空の状態
+        self.events = []           # [(時刻, 州, 支配者)] 取り込んだ占領イベント (戻ってやり直すとき用)
+        self._snap_times = []
+        self.last_time = None
+
+    # -----------------------------------
+    # 追加
+    # -----------------------------------
+    def _checkpoint_until(self, t):
+        """
+        t を含む区切りの開始時刻でスナップショットを残す。
+        スナップショットは「その時刻より前の差分を全て適用した状態」なので、
+        区切り以降の差分を既に適用していれば次の区切りまで待つ。変化が無い区切りも保存しない。
+        """
+        cp = (t // self.interval) * self.interval
+        if not self._snap_times:
+            self.snapshots.append((cp, {}))
+            self._snap_times.append(cp)
+            return
+        last_snap = self._snap_times[-1]
+        if cp > last_snap and self._delta_times and last_snap <= self._delta_times[-1] < cp:
+            self.snapshots.append((cp, dict(self.state)))
+            self._snap_times.append(cp)
+
+    def _apply(self, t, province, owner):
+        self._checkpoint_until(t)
+        self.events.append((t, province, owner))
+        old = self.state.get(province)
+        if old != owner:
+            self.state[province] = owner
+            self.deltas.append((t, province, old, owner))
+            self._delta_times.append(t)
+        self.last_time = t if self.last_time is None else max(self.last_time, t)
+
+    def _rewind(self, t):
+        """ 時刻 t 以前の最後のスナップショットまで戻し、その後に取り込んだイベントを返す """
+        i = bisect_right(self._snap_times, t) - 1
+        if i < 0:
+            # 最初のスナップショットより前: 全部やり直す
+            replay = self.events
+            self.__init__(self.interval / 3600)
+            return replay
+        snap_time, snap_state = self.snapshots[i]
+        # 変化の無かったイベントも、前に別のイベントが入ると変化になりうるので元のイベントから適用し直す
+        k = bisect_left(self.events, (snap_time,))
+        replay = self.events[k:]
+        self.events = self.events[:k]
+        j = bisect_left(self._delta_times, snap_time)
+
+        self.snapshots = self.snapshots[:i + 1]
+        self._snap_times = self._snap_times[:i + 1]
+        self.deltas = self.deltas[:j]
+        self._delta_times = self._delta_times[:j]
+        self.state = dict(snap_state)
+        self.last_time = snap_time
+        return replay
+
+    def add_events(self, map_events):
+        """ extract_events の地図イベントのうち、時刻の分かる占領イベントを取り込む """
+        items = sorted((ev['sort_key'], ev['location'], ev['country']) for ev in map_events
+                       if ev.get('type') == 'occupy' and ev.get('sort_key'))
+        if not items:
+            return
+        if self.last_time is not None and items[0][0] < self.last_time:
+            items = sorted(self._rewind(items[0][0]) + items)
+        for t, province, owner in items:
+            self._apply(t, province, owner)
+
+    # -----------------------------------
+    # 参照
+    # -----------------------------------
+    def state_at(self, t):
+        """ 時刻 t 時点の {州: 支配者} """
+        i = bisect_right(self._snap_times, t) - 1
+        if i < 0:
+            return {}
+        snap_time, snap_state = self.snapshots[i]
+        state = dict(snap_state)
+        for _, province, _, new in self.deltas[bisect_left(self._delta_times, snap_time):bisect_right(self._delta_times, t)]:
+            state[province] = new
+        return state
+
+    def changes_between(self, start, end):
+        """ start <= 時刻 < end に支配者が変わった州。{州: (前の支配者, 最後の支配者, 回数)} """
+        changes = {}
+        for _, province, old, new in self.deltas[bisect_left(self._delta_times, start):bisect_left(self._delta_times, end)]:
+            first_old, _, n = changes.get(province, (old, None, 0))
+            changes[province] = (first_old, new, n + 1)
+        return changes
+
+    def changes_on_day(self, day):
+        return self.changes_between(day * 86400, (day + 1) * 86400)
+
+
+def build_timeline(target_dir, snapshot_hours=DEFAULT_SNAPSHOT_HOURS):
+    import analyze_war_log
+    event_filter = analyze_war_log.make_filter(event_types=['occupy'])
+    _, map_events = analyze_war_log.extract_events(analyze_war_log.get_files(target_dir), event_filter=event_filter)
+    timeline = TerritoryTimeline(snapshot_hours)
+    timeline.add_events(map_events)
+    return timeline
+
+
+def print_state(state, title):
+    print(f"\n【{title}】 {len(state)} 州")
+    by_owner = {}
+    for province, owner in state.items():
+        by_owner.setdefault(owner, []).append(province)
+    for owner in sorted(by_owner, key=lambda o: (-len(by_owner[o]), o)):
+        print(f"■ {owner} ({len(by_owner[owner])}): {', '.join(sorted(by_owner[owner]))}")
+
+
+def print_changes(changes, title):
+    print(f"\n【{title}】 {len(changes)} 州")
+    for province in sorted(changes):
+        old, new, n = changes[province]
+        print(f"　{province}: {old or '(不明)'} → {new}" + (f" ({n} 回)" if n > 1 else ""))
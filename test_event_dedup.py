@@ -0,0 +1,40 @@
+import analyze_war_log
+import estimate_enemy_unit
+from event_dedup import EventDeduplicator
+
+_LOSS = ('<p><span class="event_time">Day {day} 0{h}:00:00</span> '
+         '<span class="func_country_link">Egypt</span> lost: {n} Main Battle Tank over '
+         '<span data-prov-name="Khartoum">Khartoum</span>.</p>')
+_OCCUPY = ('<p><span class="event_time">Day {day} 0{h}:30:00</span> The 2th Strike Fighter '
+           '(<span class="func_country_link">Sudan</span>) has occupied '
+           '<span data-prov-name="Port Sudan">Port Sudan</span>.</p>')
+
+
+def _export(path, days):
+    body = "".join(_LOSS.format(day=d, h=h, n=d + h) + _OCCUPY.format(day=d, h=h) for d in days for h in (1, 2))
+    path.write_text('<html><body><div class="newspaper_article"><div class="newspaper_title">News</div>'
+                    f'<div class="newspaper_body">{body}</div></div></body></html>', encoding='utf-8')
+    return str(path)
+
+
+def test_type_filtered_run_skips_files_already_covered_by_the_index(tmp_path, capsys):
+    # 大きいエクスポートが小さいエクスポートの内容を全て含む
+    big = _export(tmp_path / "a.html", [30, 31, 32])
+    small = _export(tmp_path / "b.html", [31, 32])
+    estimate_enemy_unit.extract_units([big, small], [])  # 絞り込みなしの解析でインデックスを作る
+    assert set(EventDeduplicator.for_dir(str(tmp_path)).index) == {str(tmp_path / "a.html"), str(tmp_path / "b.html")}
+    capsys.readouterr()
+
+    event_filter = analyze_war_log.make_filter(event_types=['loss'])
+    casualties, _ = analyze_war_log.extract_events([big, small], event_filter=event_filter)
+    out = capsys.readouterr().out
+    assert f"[{small}] 全て解析済みのイベントのためスキップ" in out
+    assert sum(r['Count'] for r in casualties) == sum(d + h for d in (30, 31, 32) for h in (1, 2))
+
+
+def test_type_filtered_run_without_index_does_not_skip(tmp_path, capsys):
+    big = _export(tmp_path / "a.html", [30, 31])
+    small = _export(tmp_path / "b.html", [31])
+    casualties, _ = analyze_war_log.extract_events([big, small], event_filter=analyze_war_log.make_filter(event_types=['loss']))
+    assert "スキップ" not in capsys.readouterr().out
+    assert sum(r['Count'] for r in casualties) == sum(d + h for d in (30, 31) for h in (1, 2))
@@ -0,0 +1,33 @@
+from unit_lifecycle import ALIVE_FOREVER, UnitLifecycleIndex
+
+
+def _rec(t, number, name="Main Battle Tank", destroyed=False, by=None, country="Sudan"):
+    return {'Country': country, 'UnitNumber': number, 'UnitName': name, 'TimeVal': t,
+            'LastSeen': f"t{t}", 'Destroyed': destroyed, 'DestroyedBy': by}
+
+
+def test_mutual_kill_in_same_second_does_not_open_a_new_life():
+    # 相打ち: 同じ秒に「撃破された記録」と「攻撃側としての目撃」がある (記録の順番は問わない)
+    t = 2595600
+    for records in ([_rec(t, 7, destroyed=True, by="Iraq"), _rec(t, 7)],
+                    [_rec(t, 7), _rec(t, 7, destroyed=True, by="Iraq")]):
+        index = UnitLifecycleIndex.from_records([_rec(t - 3600, 7)] + records)
+        assert len(index.lives) == 1
+        life = index.lives[0]
+        assert (life.first_seen, life.end, life.destroyed_by) == (t - 3600, t, "Iraq")
+        assert index.alive_at(t + 86400) == []
+
+
+def test_duplicate_destruction_records_keep_a_single_life():
+    t = 2595600
+    index = UnitLifecycleIndex.from_records([
+        _rec(t - 60, 3), _rec(t, 3, destroyed=True, by="Iraq"), _rec(t, 3, destroyed=True, by="Egypt")])
+    assert [(l.first_seen, l.end, l.destroyed_by) for l in index.lives] == [(t - 60, t, "Iraq")]
+
+
+def test_reappearance_after_destruction_is_a_new_life():
+    t = 2595600
+    index = UnitLifecycleIndex.from_records([
+        _rec(t - 60, 5), _rec(t, 5, destroyed=True, by="Iraq"), _rec(t + 1, 5, name="Motorized Infantry")])
+    assert [(l.first_seen, l.end) for l in index.lives] == [(t - 60, t), (t + 1, ALIVE_FOREVER)]
+    assert [l.name for l in index.alive_at(t + 10)] == ["Motorized Infantry"]
@@ -0,0 +1,182 @@
+from bisect import bisect_left, bisect_right
+
+import estimate_enemy_unit
+
+# =========================================================
+# 部隊のライフサイクル (初確認 → 名前・兵種の変化 → 撃破)
+# =========================================================
+# estimate_enemy_unit.latest_sightings は (国, 部隊番号) ごとに最新の1件だけを残すが、
+# ここでは全ての目撃記録から部隊ごとの「生存区間」を作る。
+#   first_seen    : 初めて確認した時刻
+#   last_seen     : 最後に確認した時刻
+#   names         : [(時刻, 部隊名)] 名前 (兵種) が変わるたびに追加
+#   destroyed_at  : "destroyed by" で撃破された時刻 (未確認なら None)
+# 撃破された後に同じ番号が再び現れたら、作り直された別の部隊として新しい区間にする。
+#
+# 時刻はすべてゲーム内の通算秒 (estimate_enemy_unit.parse_time と同じ)。
+# 国ごとに区間木 (生存区間) と初確認時刻のソート済みリストを持つので、
+#   「時刻 T に生きていた部隊」       -> O(log n + 件数)
+#   「A日〜B日に新しく現れた部隊」    -> O(log n + 件数)
+# で答えられる。
+
+ALIVE_FOREVER = float('inf')
+
+
+class UnitLife:
+    def __init__(self, country, number, first_seen, name):
+        self.country = country
+        self.number = number
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.last_seen_str = ""
+        self.names = [(first_seen, name)]
+        self.destroyed_at = None
+        self.destroyed_by = None
+
+    @property
+    def name(self):
+        return self.names[-1][1]
+
+    @property
+    def end(self):
+        """ 生存区間の終わり。撃破が確認されていなければ無限大 """
+        return self.destroyed_at if self.destroyed_at is not None else ALIVE_FOREVER
+
+    def sight(self, time_val, name, date_str):
+        if time_val >= self.last_seen:
+            self.last_seen = time_val
+            self.last_seen_str = date_str
+        if name != self.names[-1][1]:
+            self.names.append((time_val, name))
+
+    def __repr__(self):
+        return f"UnitLife({self.country} #{self.number} {self.name} {self.first_seen}-{self.end})"
+
+
+class IntervalTree:
+    """ 静的な中心区間木。[start, end] が点 t を含む要素を O(log n + 件数) で返す """
+
+    def __init__(self, intervals):
+        # intervals: [(start, end, item)]
+        self.center = None
+        self.left = self.right = None
+        if not intervals:
+            return
+        points = sorted(p for s, e, _ in intervals for p in (s, e) if p != ALIVE_FOREVER)
+        self.center = points[len(points) // 2] if points else intervals[0][0]
+        here, left, right = [], [], []
+        for iv in intervals:
+            if iv[1] < self.center:
+                left.append(iv)
+            elif iv[0] > self.center:
+                right.append(iv)
+            else:
+                here.append(iv)
+        # 中心を含む区間は、開始の昇順と終了の降順の2通りで持つ
+        self.by_start = sorted(here, key=lambda iv: iv[0])
+        self.by_end = sorted(here, key=lambda iv: iv[1], reverse=True)
+        self._starts = [iv[0] for iv in self.by_start]
+        self._neg_ends = [-iv[1] for iv in self.by_end]
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, t):
+        node, found = self, []
+        while node is not None and node.center is not None:
+            if t < node.center:
+                found.extend(iv[2] for iv in node.by_start[:bisect_right(node._starts, t)])
+                node = node.left
+            elif t > node.center:
+                found.extend(iv[2] for iv in node.by_end[:bisect_right(node._neg_ends, -t)])
+                node = node.right
+            else:
+                found.extend(iv[2] for iv in node.by_start)
+                break
+        return found
+
+
+class UnitLifecycleIndex:
+    def __init__(self, lives):
+        self.lives = lives
+        by_country = {}
+        for life in lives:
+            by_country.setdefault(life.country, []).append(life)
+        self._trees = {}
+        self._created = {}
+        for country, country_lives in by_country.items():
+            self._trees[country] = IntervalTree([(l.first_seen, l.end, l) for l in country_lives])
+            created = sorted(country_lives, key=lambda l: l.first_seen)
+            self._created[country] = ([l.first_seen for l in created], created)
+
+    @classmethod
+    def from_records(cls, unit_records):
+        """ estimate_enemy_unit.extract_units の結果 (全目撃記録) から作る """
+        lives = []
+        current = {}
+        # 同じ時刻では目撃を撃破より先に処理する (相打ちで、撃破の直後に目撃が来ても新しい部隊にしない)
+        for rec in sorted(unit_records, key=lambda r: (r['TimeVal'], bool(r.get('Destroyed')))):
+            if not rec['TimeVal']:
+                continue  # 日時が読めない記録は区間を作れない
+            key = (rec['Country'], rec['UnitNumber'])
+            life = current.get(key)
+            # 作り直された部隊とみなすのは、撃破より後に現れた場合だけ
+            if life is None or (life.destroyed_at is not None and rec['TimeVal'] > life.destroyed_at):
+                life = UnitLife(rec['Country'], rec['UnitNumber'], rec['TimeVal'], rec['UnitName'])
+                lives.append(life)
+                current[key] = life
+            life.sight(rec['TimeVal'], rec['UnitName'], rec['LastSeen'])
+            if rec.get('Destroyed') and life.destroyed_at is None:
+                life.destroyed_at = rec['TimeVal']
+                life.destroyed_by = rec.get('DestroyedBy')
+        return cls(lives)
+
+    def countries(self):
+        return sorted(self._trees)
+
+    def alive_at(self, t, country=None):
+        """ 時刻 t に生きていた (初確認済みで、まだ撃破されていない) 部隊 """
+        countries = [country] if country else self.countries()
+        result = []
+        for c in countries:
+            tree = self._trees.get(c)
+            if tree is not None:
+                result.extend(l for l in tree.stab(t) if l.destroyed_at is None or t < l.destroyed_at)
+        return sorted(result, key=lambda l: (l.country, -l.number))
+
+    def created_between(self, start, end, country=None):
+        """ start <= 初確認 <= end の部隊 """
+        countries = [country] if country else self.countries()
+        result = []
+        for c in countries:
+            starts, created = self._created.get(c, ([], []))
+            result.extend(created[bisect_left(starts, start):bisect_right(starts, end)])
+        return result
+
+
+def game_time(day, time_str="00:00:00"):
+    """ ゲーム内の日数と時刻を通算秒にする """
+    h, m, s = map(int, time_str.split(':'))
+    return day * 86400 + h * 3600 + m * 60 + s
+
+
+def _fmt(t):
+    if t is None or t == ALIVE_FOREVER:
+        return "-"
+    day, rem = divmod(int(t), 86400)
+    return f"Day {day} {rem // 3600:02}:{rem % 3600 // 60:02}:{rem % 60:02}"
+
+
+def print_lives(lives, title):
+    print(f"\n【{title}】 {len(lives)} 部隊")
+    print(f"{'国':<8} | {'番号':<5} | {'部隊名':<28} | {'初確認':<16} | {'最終確認':<16} | 撃破")
+    print("-" * 100)
+    for l in lives:
+        history = " → ".join(n for _, n in l.names)
+        destroyed = f"{_fmt(l.destroyed_at)} ({l.destroyed_by})" if l.destroyed_at is not None else "-"
+        print(f"{l.country:<8} | #{l.number:<4} | {history:<28} | {_fmt(l.first_seen):<16} | {_fmt(l.last_seen):<16} | {destroyed}")
+
+
+def build_index(target_dir=estimate_enemy_unit.TARGET_DIR, target_countries=None):
+    files = estimate_enemy_unit.get_files(target_dir)
+    records = estimate_enemy_unit.extract_units(files, target_countries or [])
+    return UnitLifecycleIndex.from_records(records)